@@ -2,32 +2,65 @@ import asyncio
 import os
 import re
 import json
-from typing import Optional, Tuple
-from datetime import datetime
+from typing import Optional, Tuple, Callable, Awaitable
+from datetime import datetime, timezone
+import email.utils
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+import queue
+import atexit
 import urllib.parse
-import itertools
 import tempfile
+import shutil
 import time
+import io
+import contextlib
+import functools
+import html
+import string
+import random
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 from dotenv import load_dotenv
 
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+import aiofiles
 import aiohttp
 import discord
 import yt_dlp
 
 from discord.ext import commands, tasks
-import boto3
-import botocore
+import aioboto3
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import ClientError
 
+class FastRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler that skips the per-record stat calls while the file is clearly under maxBytes."""
+
+    def shouldRollover(self, record):
+        if self.stream is None:
+            self.stream = self._open()
+        if self.maxBytes > 0 and self.stream.tell() + len(self.format(record)) + 1 >= self.maxBytes:
+            return super().shouldRollover(record)
+        return False
+
+
 # Set up logging
 def setup_logging():
-    """Configure logging with both file and console handlers."""
+    """
+    Configure logging with both file and console handlers.
+    The handlers run on a QueueListener thread so log writes never block the event loop.
+    """
     log_dir = os.path.join(os.path.dirname(__file__), "logs")
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
+    os.makedirs(log_dir, exist_ok=True)
 
     log_file = os.path.join(log_dir, "embedbot.log")
     
@@ -40,7 +73,7 @@ def setup_logging():
     )
     
     # File handler with rotation
-    file_handler = RotatingFileHandler(
+    file_handler = FastRotatingFileHandler(
         log_file, maxBytes=10*1024*1024, backupCount=5
     )
     file_handler.setFormatter(file_formatter)
@@ -49,21 +82,25 @@ def setup_logging():
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(console_formatter)
     
-    # Set up the logger
+    # Set up the logger - records are queued and written by the listener thread
+    log_queue = queue.Queue(-1)
+    listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
     logger = logging.getLogger('embedbot')
     logger.setLevel(logging.INFO)
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    logger.addHandler(QueueHandler(log_queue))
     
-    return logger
+    return logger, listener
 
 # Initialize logger
-logger = setup_logging()
+logger, log_listener = setup_logging()
 
 # --- Configuration ---
 load_dotenv()
 BOT_TOKEN = os.getenv("DISCORD_BOT_TOKEN")
-ALLOWED_GUILDS = [int(id) for id in os.getenv("ALLOWED_GUILDS", "").split(",") if id]
+ALLOWED_GUILDS = frozenset(int(id) for id in os.getenv("ALLOWED_GUILDS", "").split(",") if id.strip())
 S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME")
 AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
 AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
@@ -73,37 +110,157 @@ COUNTER_FILE = os.path.join(os.path.dirname(__file__), "html_counter.txt")
 COBALT_API_URL = os.getenv("COBALT_API_URL")
 # Custom Docker host alias, defaults to host.docker.internal
 DOCKER_HOST_ALIAS = os.getenv("DOCKER_HOST_ALIAS", "host.docker.internal")
+# Part size used for multipart S3 uploads (bytes)
+S3_MULTIPART_CHUNKSIZE = int(os.getenv("S3_MULTIPART_CHUNKSIZE", str(16 * 1024 * 1024)))
+# S3 rejects multipart parts smaller than 5 MiB (except the last one)
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_VIDEO_SIZE = 500 * 1024 * 1024  # 500 MB limit
+
+# Retry backoff for handle_video_url: base ** attempt, stretched by up to 50% jitter and capped
+RETRY_BACKOFF_BASE = 1.5
+RETRY_MAX_DELAY = 30.0
+
+
+class UnrecoverableError(Exception):
+    """A processing failure that retrying the same URL cannot fix (e.g. the video is too large)."""
+
+
+# Rate-limited (429) attempts wait as long as the server asks, and have their own retry budget
+RATE_LIMIT_MAX_RETRIES = 3
+RATE_LIMIT_MAX_DELAY = 60.0
+RATE_LIMIT_DEFAULT_DELAY = 5.0
+RATE_LIMIT_JITTER = 5.0
+
+
+class RateLimitedError(Exception):
+    """A remote API answered 429; retry_after is how long it asked us to wait, in seconds."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limited, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+def parse_retry_after(headers) -> float:
+    """Seconds to wait according to a 429 response's headers, clamped to RATE_LIMIT_MAX_DELAY."""
+    # Retry-After may be seconds or an HTTP date; the reset-after headers are (fractional) seconds
+    for name in ("Retry-After", "X-RateLimit-Reset-After", "RateLimit-Reset"):
+        value = headers.get(name)
+        if not value:
+            continue
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                delay = (email.utils.parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+            except (TypeError, ValueError):
+                continue
+        return min(max(delay, 0.0), RATE_LIMIT_MAX_DELAY)
+    return RATE_LIMIT_DEFAULT_DELAY
+
+
+# A downloaded video is an uploader that streams it to S3 under the given key and returns its URL
+VideoSource = Callable[[str], Awaitable[str]]
 
 def load_config() -> dict:
     """Load configuration from config.json."""
+    config_path = os.path.join(os.path.dirname(__file__), 'config.json')
     try:
-        config_path = os.path.join(os.path.dirname(__file__), 'config.json')
-        if not os.path.exists(config_path):
-            logger.warning("config.json not found")
-            return {}
-            
-        with open(config_path, 'r') as f:
-            config = json.load(f)
-        return config
+        with open(config_path, 'rb') as f:
+            return json_loads(f.read())
+    except FileNotFoundError:
+        logger.warning("config.json not found")
+        return {}
     except Exception as e:
-        logger.error(f"Error loading config: {e}")
+        logger.error("Error loading config: %s", e)
         return {}
 
-# Initialize S3 client
-s3_client = boto3.client(
-    's3',
+# Initialize S3 session - the client itself is opened once in setup_hook and reused
+s3_session = aioboto3.Session(
     aws_access_key_id=AWS_ACCESS_KEY_ID,
     aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
     region_name=AWS_REGION
 )
+s3_client = None
+s3_exit_stack = contextlib.AsyncExitStack()
+
+# Concurrency limits - downloads hold large buffers, so keep them low on small hosts
+DOWNLOAD_SEM = asyncio.Semaphore(int(os.getenv("MAX_CONCURRENT_DOWNLOADS", "3")))
+UPLOAD_SEM = asyncio.Semaphore(8)
+# Per-provider cap on top of DOWNLOAD_SEM, so a burst of links to one site can't take every download slot
+PROVIDER_DOWNLOAD_LIMIT = int(os.getenv("MAX_DOWNLOADS_PER_PROVIDER", "2"))
+provider_sems: dict[str, asyncio.Semaphore] = {}
+
+# yt-dlp is blocking and CPU heavy (muxing), so it runs in worker processes
+YTDLP_WORKERS = int(os.getenv("YTDLP_WORKERS", "2"))
+
+
+def _init_ytdlp_worker() -> None:
+    """Log straight to the handlers in pool workers, records queued there would wait on the worker's own listener thread."""
+    logger.handlers = list(log_listener.handlers)
+
+
+def _new_ytdlp_pool() -> ProcessPoolExecutor:
+    """
+    Create the yt-dlp worker pool.
+    Workers are spawned, not forked - forking once the log listener thread runs can copy its held locks into the child.
+    """
+    return ProcessPoolExecutor(
+        max_workers=YTDLP_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_ytdlp_worker,
+    )
+
+
+YTDLP_POOL = _new_ytdlp_pool()
+
+# Shared HTTP session for Cobalt requests, created in setup_hook
+HTTP_SESSION: Optional[aiohttp.ClientSession] = None
+
+# Multipart settings for upload_fileobj (io_chunksize raised from the 16 KiB default)
+S3_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=S3_MULTIPART_CHUNKSIZE,
+    max_concurrency=10,
+    io_chunksize=1024 * 1024,
+    use_threads=False
+)
 
 # --- Bot Setup ---
+class EmbedBot(commands.Bot):
+    async def setup_hook(self) -> None:
+        """Open long-lived clients once, before any gateway events are dispatched."""
+        global s3_client, HTTP_SESSION
+        if s3_client is None:
+            s3_client = await s3_exit_stack.enter_async_context(s3_session.client('s3'))
+            logger.info("S3 client initialized")
+        if HTTP_SESSION is None:
+            HTTP_SESSION = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=100, limit_per_host=20, ttl_dns_cache=300, keepalive_timeout=75
+                ),
+                # Default bound for any call that doesn't pass its own timeout
+                timeout=aiohttp.ClientTimeout(total=60)
+            )
+            logger.info("HTTP session initialized")
+        await load_counter()
+
+    async def close(self) -> None:
+        """Release long-lived clients before shutting down."""
+        global s3_client, HTTP_SESSION
+        if HTTP_SESSION is not None:
+            await HTTP_SESSION.close()
+            HTTP_SESSION = None
+        await s3_exit_stack.aclose()
+        s3_client = None
+        YTDLP_POOL.shutdown(wait=False, cancel_futures=True)
+        await super().close()
+
 intents = discord.Intents.default()
 intents.message_content = True
-bot = commands.Bot(command_prefix=commands.when_mentioned_or("!"), intents=intents)
+bot = EmbedBot(command_prefix=commands.when_mentioned_or("!"), intents=intents)
 
 # Status messages for the bot to cycle through
-STATUS_MESSAGES = itertools.cycle([
+STATUS_MESSAGES = (
     "im stuck on a pi 4 2gb",
     "I need to scroll",
     "say that again",
@@ -111,60 +268,112 @@ STATUS_MESSAGES = itertools.cycle([
     "act like an angel & dress like crazy",
     "King von anti piracy screen",
     "Now with Cobalt!"
-])
+)
+_status_idx = 0
 
 @tasks.loop(seconds=30)
 async def presence_loop():
     """Update the bot's status message every 30 seconds."""
+    global _status_idx
     try:
-        status = next(STATUS_MESSAGES)
+        status = STATUS_MESSAGES[_status_idx % len(STATUS_MESSAGES)]
+        _status_idx += 1
         await bot.change_presence(activity=discord.CustomActivity(name=status))
     except Exception as e:
-        logger.error(f"Error in presence loop: {e}")
+        logger.error("Error in presence loop: %s", e)
 
 # --- URL Matching ---
-TIKTOK_REGEX = re.compile(r"https?://(?:www\.|vt\.)?tiktok\.com/.*")
-FACEBOOK_REGEX = re.compile(r"https?://(?:www\.|m\.|business\.)?facebook\.com/.*")
-INSTAGRAM_REGEX = re.compile(r"https?://(?:www\.)?instagram\.com/(?:p|reel)/([a-zA-Z0-9_-]+)(?:/.*)?")
+TIKTOK_REGEX = re.compile(r"https?://(?:www\.|vt\.)?tiktok\.com/.*", re.ASCII)
+FACEBOOK_REGEX = re.compile(r"https?://(?:www\.|m\.|business\.)?facebook\.com/.*", re.ASCII)
+INSTAGRAM_REGEX = re.compile(r"https?://(?:www\.)?instagram\.com/(?:p|reel)/[a-zA-Z0-9_-]+(?:/.*)?", re.ASCII)
+# Combine regexes once for scanning message content; the group a match lands in names its provider
+COMBINED_URL_REGEX = re.compile(
+    f"(?P<TikTok>{TIKTOK_REGEX.pattern})|(?P<Facebook>{FACEBOOK_REGEX.pattern})|(?P<Instagram>{INSTAGRAM_REGEX.pattern})",
+    re.ASCII
+)
+# Domain substring -> provider name; every regex match contains one of these
+PROVIDER_HINTS = (
+    ("tiktok.com", "TikTok"),
+    ("facebook.com", "Facebook"),
+    ("instagram.com", "Instagram"),
+)
+# Messages without any of these can skip the regex scan
+URL_HINTS = tuple(hint for hint, _ in PROVIDER_HINTS)
+
+# (channel_id, url) -> dispatch time, so a link pasted repeatedly in a channel is only handled once.
+# Failed links are dropped again so a repost can retry them
+RECENT_URL_WINDOW = 60
+RECENT_URLS_SIZE = 512
+recent_urls: "OrderedDict[Tuple[int, str], float]" = OrderedDict()
+
+# channel_id -> last dispatched handler task. URLs download concurrently, but each handler waits for
+# the one dispatched before it in the same channel before posting, so replies keep message order
+channel_tails: dict[int, asyncio.Task] = {}
+# Longest a handler waits on its predecessor before posting anyway, so one stuck upload can't hold a channel
+POST_ORDER_TIMEOUT = 120
+
+
+def _forget_channel_tail(channel_id: int, task: asyncio.Task) -> None:
+    """Drop a finished handler from channel_tails unless a newer one has replaced it."""
+    if channel_tails.get(channel_id) is task:
+        del channel_tails[channel_id]
 
 # --- Download Functions ---
 
-async def download_via_cobalt(url: str) -> Optional[Tuple[bytes, str]]:
-    """Attempt to download video content using the Cobalt API."""
+_LOCAL_HOSTNAMES = frozenset(("127.0.0.1", "localhost"))
+
+
+def _dockerize(url: str) -> str:
+    """Point localhost/127.0.0.1 URLs at the Docker host alias, keeping the original port."""
+    parts = urllib.parse.urlsplit(url)
+    if parts.hostname not in _LOCAL_HOSTNAMES:
+        return url
+    netloc = f"{DOCKER_HOST_ALIAS}:{parts.port}" if parts.port else DOCKER_HOST_ALIAS
+    translated = urllib.parse.urlunsplit(parts._replace(netloc=netloc))
+    logger.info("Translated URL from %s to %s for Docker", url, translated)
+    return translated
+
+
+# COBALT_API_URL is static, so resolve the Docker rewrite and its scheme://host once at startup
+COBALT_ENDPOINT = _dockerize(COBALT_API_URL.rstrip('/')) if COBALT_API_URL else None
+COBALT_DOMAIN = None
+_COBALT_SCHEME = _COBALT_NETLOC = ''
+if COBALT_API_URL:
+    try:
+        _parsed_cobalt_api = urllib.parse.urlparse(COBALT_API_URL)
+        _COBALT_SCHEME, _COBALT_NETLOC = _parsed_cobalt_api.scheme, _parsed_cobalt_api.netloc
+        COBALT_DOMAIN = f"{_COBALT_SCHEME}://{_COBALT_NETLOC}"
+        logger.info("Extracted actual domain from COBALT_API_URL: %s", COBALT_DOMAIN)
+    except ValueError as e:
+        logger.error("Failed to parse COBALT_API_URL: %s", e)
+
+
+def _rebase_on_cobalt(url: str) -> str:
+    """Put a relative or placeholder-domain Cobalt URL on COBALT_DOMAIN, keeping its path and query."""
+    parts = urllib.parse.urlsplit(url)
+    # urlunsplit adds the "/" a relative path is missing once there is a netloc
+    return urllib.parse.urlunsplit(parts._replace(scheme=_COBALT_SCHEME, netloc=_COBALT_NETLOC))
+
+
+COBALT_HEADERS = {
+    'Accept': 'application/json',
+    'Accept-Encoding': 'gzip, deflate',
+    'Content-Type': 'application/json'
+}
+COBALT_POST_TIMEOUT = aiohttp.ClientTimeout(total=30, connect=5)
+# The media body is piped straight into S3, which may outlast any fixed total - only bound connect and reads
+MEDIA_GET_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=60)
+
+
+async def download_via_cobalt(url: str, stack: contextlib.AsyncExitStack) -> Optional[Tuple[VideoSource, str]]:
+    """
+    Attempt to download video content using the Cobalt API.
+    The media response is kept open on `stack` and returned as a streaming uploader.
+    """
     if not COBALT_API_URL:
         logger.warning("COBALT_API_URL not configured, skipping Cobalt.")
         return None
 
-    cobalt_endpoint = COBALT_API_URL.rstrip('/')
-    
-    # Translation for Docker: If Cobalt API URL uses localhost/127.0.0.1, replace with host.docker.internal
-    if "://127.0.0.1:" in cobalt_endpoint or "://localhost:" in cobalt_endpoint:
-        original_endpoint = cobalt_endpoint
-        # Extract the original host and port
-        parts = cobalt_endpoint.split("://")
-        if len(parts) == 2:
-            protocol = parts[0]
-            rest = parts[1]
-            # Find where the host:port ends
-            if "/" in rest:
-                host_port, path = rest.split("/", 1)
-                # Replace localhost or 127.0.0.1 with host.docker.internal, keeping the original port
-                if ":" in host_port:
-                    host, port = host_port.split(":", 1)
-                    if host in ["127.0.0.1", "localhost"]:
-                        new_host_port = f"{DOCKER_HOST_ALIAS}:{port}"
-                        cobalt_endpoint = f"{protocol}://{new_host_port}/{path}"
-                        logger.info(f"Translated Cobalt API URL from {original_endpoint} to {cobalt_endpoint} for Docker")
-            else:
-                # No path, just host:port
-                host_port = rest
-                if ":" in host_port:
-                    host, port = host_port.split(":", 1)
-                    if host in ["127.0.0.1", "localhost"]:
-                        new_host_port = f"{DOCKER_HOST_ALIAS}:{port}"
-                        cobalt_endpoint = f"{protocol}://{new_host_port}"
-                        logger.info(f"Translated Cobalt API URL from {original_endpoint} to {cobalt_endpoint} for Docker")
-    
     payload = {
         "url": url,
         "downloadMode": "auto",
@@ -172,376 +381,624 @@ async def download_via_cobalt(url: str) -> Optional[Tuple[bytes, str]]:
         "youtubeVideoCodec": "h264"
     }
     
-    logger.info(f"Attempting download via Cobalt: {url}")
+    logger.info("Attempting download via Cobalt: %s", url)
 
     try:
-        async with aiohttp.ClientSession() as session:
-            headers = {
-                'Accept': 'application/json',
-                'Content-Type': 'application/json'
-            }
-            async with session.post(cobalt_endpoint, json=payload, headers=headers, timeout=30) as response:
-                if response.status != 200:
-                    logger.error(f"Cobalt API request failed with status {response.status}: {await response.text()}")
-                    return None
+        async with HTTP_SESSION.post(COBALT_ENDPOINT, json=payload, headers=COBALT_HEADERS, timeout=COBALT_POST_TIMEOUT) as response:
+            if response.status == 429:
+                retry_after = parse_retry_after(response.headers)
+                logger.warning("Cobalt API rate limited, asked to retry after %.1f seconds", retry_after)
+                raise RateLimitedError(retry_after)
+            if response.status != 200:
+                # Cobalt reports failures as a JSON error body - read it once and log its code when it parses
+                raw = await response.read()
+                try:
+                    error_info = json_loads(raw).get("error", {})
+                    logger.error("Cobalt API request failed with status %s: %s - Context: %s",
+                                 response.status, error_info.get("code", "Unknown error"), error_info.get("context", {}))
+                except (ValueError, AttributeError):
+                    logger.error("Cobalt API request failed with status %s: %s",
+                                 response.status, raw.decode('utf-8', 'replace'))
+                return None
+
+            data = await response.json(loads=json_loads)
+            status = data.get("status")
+            
+            logger.debug("Cobalt response: %s", data)
+            logger.debug("Cobalt response status: %s", status)
+
+            media_url = None
+            title = "Video"  # Default title
+
+            if status == "stream":
+                media_url = data.get("url")
+            elif status == "redirect":
+                 media_url = data.get("url")
+                 if not media_url:
+                     logger.warning("Cobalt redirect status without URL.")
+                     return None
+            elif status == "tunnel":
+                 media_url = data.get("url")
+                 if not media_url:
+                     logger.warning("Cobalt tunnel status without URL.")
+                     return None
+                 # Use filename if provided
+                 if data.get("filename"):
+                     title = data.get("filename")
+                 logger.info("Cobalt provided tunnel URL: %s", media_url)
+            elif status == "picker":
+                 picker_items = data.get("picker", [])
+                 if picker_items and picker_items[0].get("url"):
+                     media_url = picker_items[0]["url"]
+                     title = picker_items[0].get("title", "Video")
+                 else:
+                     logger.warning("Cobalt picker status with no suitable items.")
+                     return None
+            elif status == "error":
+                error_info = data.get("error", {})
+                error_code = error_info.get("code", "Unknown error")
+                error_context = error_info.get("context", {})
+                logger.warning("Cobalt API returned error: %s - Context: %s", error_code, error_context)
+                return None
+            else:
+                logger.warning("Unhandled Cobalt status: %s - Full response: %s", status, data)
+                return None
 
-                data = await response.json()
-                status = data.get("status")
+            if not media_url:
+                 logger.warning("Cobalt did not provide a usable media URL.")
+                 return None
+
+            # Check if we got a placeholder domain in the URL
+            if "api.url.example" in media_url or (not media_url.startswith("http") and "/tunnel?" in media_url):
+                if not media_url.startswith("http"):
+                    logger.warning("Detected relative tunnel URL: %s", media_url)
+                else:
+                    logger.warning("Detected placeholder domain in Cobalt URL: %s", media_url)
                 
-                logger.debug(f"Cobalt response: {data}")
-                logger.debug(f"Cobalt response status: {status}")
-
-                media_url = None
-                title = "Video"  # Default title
-
-                if status == "stream":
-                    media_url = data.get("url")
-                elif status == "redirect":
-                     media_url = data.get("url")
-                     if not media_url:
-                         logger.warning("Cobalt redirect status without URL.")
-                         return None
-                elif status == "tunnel":
-                     media_url = data.get("url")
-                     if not media_url:
-                         logger.warning("Cobalt tunnel status without URL.")
-                         return None
-                     # Use filename if provided
-                     if data.get("filename"):
-                         title = data.get("filename")
-                     logger.info(f"Cobalt provided tunnel URL: {media_url}")
-                elif status == "picker":
-                     picker_items = data.get("picker", [])
-                     if picker_items and picker_items[0].get("url"):
-                         media_url = picker_items[0]["url"]
-                         title = picker_items[0].get("title", "Video")
-                     else:
-                         logger.warning("Cobalt picker status with no suitable items.")
-                         return None
-                elif status == "error":
-                    error_info = data.get("error", {})
-                    error_code = error_info.get("code", "Unknown error")
-                    error_context = error_info.get("context", {})
-                    logger.warning(f"Cobalt API returned error: {error_code} - Context: {error_context}")
-                    return None
+                if COBALT_DOMAIN:
+                    corrected_url = _rebase_on_cobalt(media_url)
+                    logger.info("Corrected Cobalt URL from %s to %s", media_url, corrected_url)
+                    media_url = corrected_url
                 else:
-                    logger.warning(f"Unhandled Cobalt status: {status} - Full response: {data}")
+                    logger.error("Could not correct URL, no valid COBALT_API_URL available")
                     return None
 
-                if not media_url:
-                     logger.warning("Cobalt did not provide a usable media URL.")
-                     return None
+            # Translation for Docker: If media_url uses localhost/127.0.0.1, replace with host.docker.internal
+            media_url = _dockerize(media_url)
 
-                # Check if we got a placeholder domain in the URL
-                if "api.url.example" in media_url or (not media_url.startswith("http") and "/tunnel?" in media_url):
-                    if not media_url.startswith("http"):
-                        logger.warning(f"Detected relative tunnel URL: {media_url}")
-                    else:
-                        logger.warning(f"Detected placeholder domain in Cobalt URL: {media_url}")
-                    
-                    # Extract the actual API domain from COBALT_API_URL
-                    cobalt_domain = None
-                    if COBALT_API_URL:
-                        try:
-                            from urllib.parse import urlparse
-                            parsed_cobalt_api = urlparse(COBALT_API_URL)
-                            cobalt_domain = f"{parsed_cobalt_api.scheme}://{parsed_cobalt_api.netloc}"
-                            logger.info(f"Extracted actual domain from COBALT_API_URL: {cobalt_domain}")
-                        except Exception as e:
-                            logger.error(f"Failed to parse COBALT_API_URL: {e}")
-                    
-                    if cobalt_domain:
-                        # Handle relative URLs
-                        if not media_url.startswith("http"):
-                            if media_url.startswith("/"):
-                                corrected_url = f"{cobalt_domain}{media_url}"
-                            else:
-                                corrected_url = f"{cobalt_domain}/{media_url}"
-                            logger.info(f"Corrected relative URL to absolute URL: {corrected_url}")
-                            media_url = corrected_url
-                        else:
-                            # Replace placeholder domain with actual domain
-                            from urllib.parse import urlparse, urlunparse
-                            parsed_media_url = urlparse(media_url)
-                            parsed_cobalt = urlparse(cobalt_domain)
-                            
-                            # Build new URL with correct domain but keep path and query
-                            corrected_url = urlunparse((
-                                parsed_cobalt.scheme,
-                                parsed_cobalt.netloc,
-                                parsed_media_url.path,
-                                parsed_media_url.params,
-                                parsed_media_url.query,
-                                parsed_media_url.fragment
-                            ))
-                            
-                            logger.info(f"Corrected domain in URL from {media_url} to {corrected_url}")
-                            media_url = corrected_url
-                    else:
-                        logger.error("Could not correct URL, no valid COBALT_API_URL available")
-                        return None
-
-                # Translation for Docker: If media_url uses localhost/127.0.0.1, replace with host.docker.internal
-                if "://127.0.0.1:" in media_url or "://localhost:" in media_url:
-                    original_url = media_url
-                    # Extract the original host and port
-                    parts = media_url.split("://")
-                    if len(parts) == 2:
-                        protocol = parts[0]
-                        rest = parts[1]
-                        # Find where the host:port ends
-                        if "/" in rest:
-                            host_port, path = rest.split("/", 1)
-                            # Replace localhost or 127.0.0.1 with host.docker.internal, keeping the original port
-                            if ":" in host_port:
-                                host, port = host_port.split(":", 1)
-                                if host in ["127.0.0.1", "localhost"]:
-                                    new_host_port = f"{DOCKER_HOST_ALIAS}:{port}"
-                                    media_url = f"{protocol}://{new_host_port}/{path}"
-                                    logger.info(f"Translated Cobalt URL from {original_url} to {media_url} for Docker")
-                
-                logger.info(f"Cobalt provided media URL: {media_url}")
-
-            # Download content from the URL Cobalt provided
-            async with session.get(media_url, timeout=60) as media_response:
-                if media_response.status == 200:
-                    video_content = await media_response.read()
-                    logger.info(f"Successfully downloaded video via Cobalt: {len(video_content)} bytes")
-                    return video_content, title
-                else:
-                    logger.error(f"Failed to download media from Cobalt URL ({media_url}): HTTP {media_response.status}")
-                    return None
+            logger.info("Cobalt provided media URL: %s", media_url)
+
+        # Open the media stream Cobalt provided - the body is piped straight into S3 by the caller
+        media_response = await stack.enter_async_context(
+            HTTP_SESSION.get(media_url, timeout=MEDIA_GET_TIMEOUT)
+        )
+        if media_response.status != 200:
+            logger.error("Failed to download media from Cobalt URL (%s): HTTP %s", media_url, media_response.status)
+            media_response.close()
+            return None
+
+        if media_response.content_length and media_response.content_length > MAX_VIDEO_SIZE:
+            logger.warning("Cobalt media exceeds 500MB limit (%s bytes). Skipping.", media_response.content_length)
+            media_response.close()
+            return None
 
+        logger.info("Streaming video via Cobalt: %s bytes", media_response.content_length or 'unknown')
+        return functools.partial(stream_to_s3, media_response, S3_BUCKET_NAME), title
+
+    except RateLimitedError:
+        raise
     except aiohttp.ClientError as e:
-        logger.error(f"Network error during Cobalt request or download: {e}")
+        logger.error("Network error during Cobalt request or download: %s", e)
         return None
     except asyncio.TimeoutError:
         logger.error("Timeout during Cobalt request or download.")
         return None
-    except json.JSONDecodeError as e:
-        logger.error(f"Failed to decode Cobalt API JSON response: {e}")
+    except ValueError as e:  # json.JSONDecodeError and orjson.JSONDecodeError both subclass it
+        logger.error("Failed to decode Cobalt API JSON response: %s", e)
         return None
     except Exception as e:
-        logger.error(f"Unexpected error during Cobalt processing: {e}", exc_info=True)
+        logger.error("Unexpected error during Cobalt processing: %s", e, exc_info=True)
         return None
 
 
-async def download_via_ytdlp(url: str) -> Optional[Tuple[bytes, str]]:
-    """Download video content using yt-dlp as a fallback."""
-    logger.info(f"Falling back to yt-dlp for URL: {url}")
-    try:
-        with tempfile.TemporaryDirectory() as temp_dir:
-            ydl_opts = {
-                'format': 'bestvideo[ext=mp4][filesize<=500M]+bestaudio[ext=m4a]/best[ext=mp4][filesize<=500M]/best[filesize<=500M]',
-                'outtmpl': os.path.join(temp_dir, 'video.%(ext)s'),
-                'quiet': True,
-                'noplaylist': True,
-                'writesubtitles': False,
-                'writeautomaticsub': False,
-                'no_warnings': True,
-                'logtostderr': False,
-                'verbose': False,
-                'no_progress': True,
-                 'http_headers': {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-                 }
-            }
-
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                try:
-                    info = ydl.extract_info(url, download=True)
-                    downloaded_files = [f for f in os.listdir(temp_dir) if f.startswith('video.')]
-                    if not downloaded_files:
-                        raise Exception("yt-dlp downloaded, but no video file found.")
+YTDLP_OPTS = {
+    'format': 'bestvideo[ext=mp4][filesize<=500M]+bestaudio[ext=m4a]/best[ext=mp4][filesize<=500M]/best[filesize<=500M]',
+    'quiet': True,
+    'noplaylist': True,
+    'writesubtitles': False,
+    'writeautomaticsub': False,
+    'no_warnings': True,
+    'logtostderr': False,
+    'verbose': False,
+    'no_progress': True,
+     'http_headers': {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+     }
+}
 
-                    video_path = os.path.join(temp_dir, downloaded_files[0])
+# One YoutubeDL per worker process - building it loads every extractor, and a worker runs one download at a time
+_ydl: Optional[yt_dlp.YoutubeDL] = None
 
-                    with open(video_path, 'rb') as f:
-                        video_content = f.read()
-                    logger.info(f"Successfully downloaded video via yt-dlp: {len(video_content)} bytes")
 
-                    # Check size after download
-                    if len(video_content) > 500 * 1024 * 1024:  # 500 MB limit
-                         logger.warning(f"yt-dlp downloaded file exceeds 500MB limit ({len(video_content)} bytes). Skipping.")
-                         return None
+def _get_ydl() -> yt_dlp.YoutubeDL:
+    """Return this worker process's YoutubeDL instance, creating it on first use."""
+    global _ydl
+    if _ydl is None:
+        _ydl = yt_dlp.YoutubeDL(YTDLP_OPTS)
+    return _ydl
 
-                    return video_content, info.get('title', 'Video')
-                except yt_dlp.utils.DownloadError as e:
-                    logger.error(f"yt-dlp download error: {e}")
-                    return None
-                except Exception as e:
-                    logger.error(f"Generic error during yt-dlp download: {e}", exc_info=True)
-                    return None
+
+def _ytdlp_sync(url: str, temp_dir: str) -> Optional[Tuple[str, str]]:
+    """
+    Blocking yt-dlp download into temp_dir, run inside a YTDLP_POOL worker process.
+    Returns (video_path, video_title); temp_dir is owned and cleaned up by the caller.
+    """
+    try:
+        ydl = _get_ydl()
+        ydl.params['outtmpl'] = {'default': os.path.join(temp_dir, 'video.%(ext)s')}
+        info = ydl.extract_info(url, download=True)
+        downloaded_files = [f for f in os.listdir(temp_dir) if f.startswith('video.')]
+        if not downloaded_files:
+            raise Exception("yt-dlp downloaded, but no video file found.")
+
+        video_path = os.path.join(temp_dir, downloaded_files[0])
+        video_size = os.path.getsize(video_path)
+        logger.info("Successfully downloaded video via yt-dlp: %s bytes", video_size)
+
+        # Check size after download
+        if video_size > MAX_VIDEO_SIZE:
+             logger.warning("yt-dlp downloaded file exceeds 500MB limit (%s bytes). Skipping.", video_size)
+             raise UnrecoverableError("Video file too large")
+
+        return video_path, info.get('title', 'Video')
+    except UnrecoverableError:
+        raise
+    except yt_dlp.utils.DownloadError as e:
+        logger.error("yt-dlp download error: %s", e)
+        return None
     except Exception as e:
-        logger.error(f"Error setting up temp dir or yt-dlp: {e}", exc_info=True)
+        logger.error("Generic error during yt-dlp download: %s", e, exc_info=True)
         return None
 
 
-async def get_video_content(url: str) -> Optional[Tuple[bytes, str]]:
+async def download_via_ytdlp(url: str, stack: contextlib.AsyncExitStack) -> Optional[Tuple[VideoSource, str]]:
+    """
+    Download video content using yt-dlp as a fallback, off the event loop.
+    The file stays on disk in a temp dir that lives until `stack` is closed.
+    """
+    global YTDLP_POOL
+    logger.info("Falling back to yt-dlp for URL: %s", url)
+    # Create and remove the temp dir in a thread - rmtree of a large video would otherwise block the loop
+    temp_dir = await asyncio.to_thread(tempfile.mkdtemp, prefix='embedbot-')
+    stack.push_async_callback(asyncio.to_thread, shutil.rmtree, temp_dir, ignore_errors=True)
+    try:
+        result = await asyncio.get_running_loop().run_in_executor(YTDLP_POOL, _ytdlp_sync, url, temp_dir)
+    except BrokenProcessPool as e:
+        # A worker died (e.g. OOM-killed) - the pool is unusable, so start a fresh one
+        logger.error("yt-dlp worker process died, restarting pool: %s", e)
+        YTDLP_POOL = _new_ytdlp_pool()
+        return None
+
+    if not result:
+        return None
+    video_path, title = result
+    return functools.partial(upload_file_to_s3, video_path, S3_BUCKET_NAME), title
+
+
+async def get_video_content(url: str, stack: contextlib.AsyncExitStack) -> Optional[Tuple[VideoSource, str]]:
     """
     Downloads video content, trying Cobalt first and falling back to yt-dlp.
-    Returns (video_content, video_title) or None if download fails.
+    Returns (video_source, video_title) or None if download fails; any open
+    streams backing video_source live until `stack` is closed.
+    Raises RateLimitedError if Cobalt was rate limited and yt-dlp failed too.
     """
     # Try Cobalt first
-    cobalt_result = await download_via_cobalt(url)
+    rate_limited = None
+    try:
+        cobalt_result = await download_via_cobalt(url, stack)
+    except RateLimitedError as e:
+        cobalt_result = None
+        rate_limited = e
     if cobalt_result:
         logger.info("Successfully obtained video content via Cobalt.")
         return cobalt_result
 
     # Fallback to yt-dlp
     logger.info("Cobalt failed or skipped, trying yt-dlp...")
-    ytdlp_result = await download_via_ytdlp(url)
+    ytdlp_result = await download_via_ytdlp(url, stack)
     if ytdlp_result:
          logger.info("Successfully obtained video content via yt-dlp.")
          return ytdlp_result
 
     # If both failed
-    logger.error(f"Failed to download video content from {url} using both Cobalt and yt-dlp.")
+    logger.error("Failed to download video content from %s using both Cobalt and yt-dlp.", url)
+    if rate_limited:
+        # Let the caller wait out Cobalt's rate limit rather than burning a normal retry
+        raise rate_limited
     return None
 
 
-async def create_redirect_html(original_url: str, filename: str) -> str:
-    """Create a simple redirect HTML page."""
-    html_content = f"""
+# Redirect page skeleton, filled in per video
+REDIRECT_HTML_TEMPLATE = string.Template("""
     <!DOCTYPE html>
     <html>
     <head>
-        <meta http-equiv="refresh" content="0;url={original_url}">
+        <meta http-equiv="refresh" content="0;url=${url}">
         <meta property="og:title" content="Redirecting..."/>
         <meta property="og:description" content="Click to view original content"/>
     </head>
     <body>
-        <p>Redirecting to <a href="{original_url}">original content</a>...</p>
+        <p>Redirecting to <a href="${url}">original content</a>...</p>
     </body>
     </html>
-    """
-    
-    logger.info(f"Uploading redirect HTML {filename} to S3")
+    """)
+
+# original_url -> uploaded redirect page URL, so reposts reuse the existing page
+REDIRECT_CACHE_SIZE = 1024
+redirect_html_cache: "OrderedDict[str, str]" = OrderedDict()
+
+
+async def create_redirect_html(original_url: str, filename: str) -> str:
+    """Create a simple redirect HTML page, reusing the one already uploaded for this URL."""
+    cached_url = redirect_html_cache.get(original_url)
+    if cached_url:
+        redirect_html_cache.move_to_end(original_url)
+        logger.info("Reusing redirect HTML for %s: %s", original_url, cached_url)
+        return cached_url
+
+    html_content = REDIRECT_HTML_TEMPLATE.substitute(url=html.escape(original_url))
+
+    logger.info("Uploading redirect HTML %s to S3", filename)
     try:
         html_url = await upload_to_s3(html_content.encode('utf-8'), filename, S3_BUCKET_NAME, content_type='text/html')
-        logger.info(f"Redirect HTML uploaded successfully: {html_url}")
+        logger.info("Redirect HTML uploaded successfully: %s", html_url)
+        redirect_html_cache[original_url] = html_url
+        if len(redirect_html_cache) > REDIRECT_CACHE_SIZE:
+            redirect_html_cache.popitem(last=False)
         return html_url
     except Exception as e:
-         logger.error(f"Failed to upload redirect HTML {filename}: {e}", exc_info=True)
+         logger.error("Failed to upload redirect HTML %s: %s", filename, e, exc_info=True)
          raise
 
 
+# original_url -> (cached_at, html_url, video_url) for recently processed videos
+URL_CACHE_TTL = 3600
+URL_CACHE_SIZE = 2048
+url_cache: "OrderedDict[str, Tuple[float, str, str]]" = OrderedDict()
+
+
+def get_cached_urls(original_url: str) -> Optional[Tuple[str, str]]:
+    """Return (html_url, video_url) if this URL was processed within URL_CACHE_TTL."""
+    entry = url_cache.get(original_url)
+    if not entry:
+        return None
+    cached_at, html_url, video_url = entry
+    if time.monotonic() - cached_at > URL_CACHE_TTL:
+        del url_cache[original_url]
+        return None
+    url_cache.move_to_end(original_url)
+    logger.info("Reusing uploads for recently processed URL %s", original_url)
+    return html_url, video_url
+
+
 async def process_video_url(original_url: str, message_content: str = "", author_name: str = "") -> tuple[Optional[str], Optional[str]]:
     """
     Process a video URL using Cobalt/yt-dlp, upload to S3, and return URLs.
     Returns (html_redirect_url, s3_video_url) or (None, None) on failure.
     """
-    logger.info(f"Processing video URL from {author_name}: {original_url}")
+    logger.info("Processing video URL from %s: %s", author_name, original_url)
 
-    try:
+    async with contextlib.AsyncExitStack() as stack:
         # Get video content
-        download_result = await get_video_content(original_url)
+        download_result = await get_video_content(original_url, stack)
 
         if not download_result:
-            logger.error(f"Failed to get video content for {original_url}")
-            raise Exception("Failed to download video content")
-
-        video_content, video_title = download_result
+            logger.error("Failed to get video content for %s", original_url)
+            return None, None
 
-        # Check size before uploading
-        if len(video_content) > 500 * 1024 * 1024:  # 500MB limit
-            logger.warning(f"Video content exceeds 500MB limit ({len(video_content)} bytes) before S3 upload. Skipping.")
-            raise Exception("Video file too large")
+        video_source, video_title = download_result
 
         # Generate unique filename
         video_number = await get_next_html_number()
         video_filename = f"{video_number}.mp4"
         html_filename = f"{video_number}.html"
 
-        # Upload video to S3
-        logger.info(f"Uploading video {video_filename} to S3")
-        video_url = await upload_to_s3(video_content, video_filename, S3_BUCKET_NAME, content_type='video/mp4')
-        logger.info(f"Video successfully uploaded to S3: {video_url}")
+        # Upload video and redirect HTML to S3 - independent PUTs, so run them concurrently
+        logger.info("Uploading video %s and redirect HTML %s to S3", video_filename, html_filename)
+        # A TaskGroup cancels and awaits the other upload if one fails, before the exit stack
+        # closes the stream or temp dir it reads from
+        try:
+            async with asyncio.TaskGroup() as tg:
+                video_task = tg.create_task(video_source(video_filename))
+                html_task = tg.create_task(create_redirect_html(original_url, html_filename))
+        except ExceptionGroup as eg:
+            # Surface the first failure itself, the retry logic in handle_video_url matches on its type
+            raise eg.exceptions[0]
+        video_url, html_url = video_task.result(), html_task.result()
+        logger.info("Video successfully uploaded to S3: %s", video_url)
+        logger.info("Redirect HTML created and uploaded: %s", html_url)
+
+    url_cache[original_url] = (time.monotonic(), html_url, video_url)
+    if len(url_cache) > URL_CACHE_SIZE:
+        url_cache.popitem(last=False)
+    return html_url, video_url
 
-        # Create and upload redirect HTML
-        logger.info(f"Generating and uploading redirect HTML {html_filename}")
-        html_url = await create_redirect_html(original_url, html_filename)
-        logger.info(f"Redirect HTML created and uploaded: {html_url}")
 
-        return html_url, video_url
+# original_url -> task processing it, so the same link posted in several places at once is downloaded once
+inflight_videos: dict[str, asyncio.Task] = {}
 
-    except Exception as e:
-        logger.error(f"Error processing video URL {original_url}: {e}", exc_info=True)
-        raise
+
+def _forget_inflight_video(original_url: str, task: asyncio.Task) -> None:
+    """Drop a finished task from inflight_videos unless a newer one has replaced it."""
+    if inflight_videos.get(original_url) is task:
+        del inflight_videos[original_url]
+
+
+async def _process_video_url_limited(original_url: str, provider_name: str, message_content: str, author_name: str) -> tuple[Optional[str], Optional[str]]:
+    """process_video_url within the overall and per-provider download limits."""
+    # Only a limited number of download/upload pipelines run at once, overall and per provider
+    provider_sem = provider_sems.setdefault(provider_name, asyncio.Semaphore(PROVIDER_DOWNLOAD_LIMIT))
+    async with provider_sem, DOWNLOAD_SEM:
+        return await process_video_url(original_url, message_content, author_name)
+
+
+async def get_video_urls(original_url: str, provider_name: str, message_content: str = "", author_name: str = "") -> tuple[Optional[str], Optional[str]]:
+    """
+    Return (html_redirect_url, s3_video_url) for a URL, reusing recent uploads and joining
+    a download of the same URL that is already running instead of starting another.
+    Errors, including RateLimitedError, reach every caller waiting on the shared download.
+    """
+    # Reposts of a recently processed URL reuse the existing uploads
+    result_urls = get_cached_urls(original_url)
+    if result_urls:
+        return result_urls
+
+    task = inflight_videos.get(original_url)
+    if task is None:
+        task = asyncio.create_task(
+            _process_video_url_limited(original_url, provider_name, message_content, author_name)
+        )
+        inflight_videos[original_url] = task
+        task.add_done_callback(functools.partial(_forget_inflight_video, original_url))
+    else:
+        logger.info("Joining in-progress download of %s", original_url)
+    # Shielded so one caller being cancelled doesn't cancel the download for the others
+    return await asyncio.shield(task)
 
 
 # --- Helper Functions ---
 def get_video_provider(url: str) -> str:
     """Determines the video provider based on the original URL."""
-    if TIKTOK_REGEX.search(url):
-        return "TikTok"
-    elif FACEBOOK_REGEX.search(url):
-        return "Facebook"
-    elif INSTAGRAM_REGEX.search(url):
-        return "Instagram"
-    else:
-        # Try to get domain name as fallback provider
-        try:
-             domain = urllib.parse.urlparse(url).netloc
-             if domain.startswith('www.'):
-                 domain = domain[4:]
-             return domain.split('.')[0].capitalize() if '.' in domain else "Link"
-        except:
-             return "Link"  # Generic fallback
+    # URLs reaching here were already validated by COMBINED_URL_REGEX, a substring test is enough
+    for hint, provider in PROVIDER_HINTS:
+        if hint in url:
+            return provider
+
+    # Try to get domain name as fallback provider
+    try:
+         domain = urllib.parse.urlparse(url).netloc
+         if domain.startswith('www.'):
+             domain = domain[4:]
+         return domain.split('.')[0].capitalize() if '.' in domain else "Link"
+    except:
+         return "Link"  # Generic fallback
 
 async def upload_to_s3(file_content: bytes, filename: str, bucket: str, content_type: str = 'video/mp4') -> str:
     """Upload a file to S3 and return its URL."""
-    logger.info(f"Starting S3 upload for file: {filename}")
+    logger.info("Starting S3 upload for file: %s", filename)
     try:
-        logger.debug(f"Uploading {len(file_content)} bytes to S3 bucket: {bucket}, Key: {filename}")
-        s3_client.put_object(
-            Bucket=bucket,
-            Key=filename,
-            Body=file_content,
-            ContentType=content_type
-        )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Uploading %d bytes to S3 bucket: %s, Key: %s", len(file_content), bucket, filename)
+        async with UPLOAD_SEM:
+            await s3_client.upload_fileobj(
+                io.BytesIO(file_content),
+                bucket,
+                filename,
+                ExtraArgs={'ContentType': content_type},
+                Config=S3_TRANSFER_CONFIG
+            )
+
+        url = s3_object_url(bucket, filename)
+        logger.info("Successfully uploaded file to S3: %s", url)
+        return url
+
+    except ClientError as e:
+        error_code = e.response.get('Error', {}).get('Code')
+        logger.error("Error uploading %s to S3 (Code: %s): %s", filename, error_code, e, exc_info=True)
+        raise
+
 
-        url = f"https://{bucket}.s3.{AWS_REGION}.amazonaws.com/{urllib.parse.quote(filename)}"
-        logger.info(f"Successfully uploaded file to S3: {url}")
+async def upload_file_to_s3(path: str, bucket: str, filename: str, content_type: str = 'video/mp4') -> str:
+    """Upload a file from disk to S3 in chunks and return its URL."""
+    logger.info("Starting S3 upload of %s as %s", path, filename)
+    try:
+        async with UPLOAD_SEM, aiofiles.open(path, 'rb') as f:
+            await s3_client.upload_fileobj(
+                f,
+                bucket,
+                filename,
+                ExtraArgs={'ContentType': content_type},
+                Config=S3_TRANSFER_CONFIG
+            )
+
+        url = s3_object_url(bucket, filename)
+        logger.info("Successfully uploaded file to S3: %s", url)
         return url
 
     except ClientError as e:
         error_code = e.response.get('Error', {}).get('Code')
-        error_msg = f"Error uploading {filename} to S3 (Code: {error_code}): {str(e)}"
-        logger.error(error_msg, exc_info=True)
+        logger.error("Error uploading %s to S3 (Code: %s): %s", filename, error_code, e, exc_info=True)
         raise
 
 
-async def get_next_html_number() -> int:
-    """Get the next available HTML number."""
+async def stream_to_s3(response: aiohttp.ClientResponse, bucket: str, filename: str, content_type: str = 'video/mp4') -> str:
+    """
+    Stream an HTTP response body into S3 and return its URL.
+    Bodies that fit in a single part are sent with put_object; larger ones
+    go through a multipart upload so only one part is buffered at a time.
+    """
+    logger.info("Starting streaming S3 upload for file: %s", filename)
+    part_size = max(S3_MULTIPART_CHUNKSIZE, S3_MIN_PART_SIZE)
+    buffer = bytearray()
+    parts = []
+    upload_id = None
+    total_bytes = 0
+
+    async def upload_part() -> None:
+        part_number = len(parts) + 1
+        part = await s3_client.upload_part(
+            Bucket=bucket, Key=filename, UploadId=upload_id, PartNumber=part_number, Body=bytes(buffer)
+        )
+        parts.append({'ETag': part['ETag'], 'PartNumber': part_number})
+        buffer.clear()
+
     try:
-        if os.path.exists(COUNTER_FILE):
-            with open(COUNTER_FILE, 'r') as f:
-                current = int(f.read().strip())
-        else:
-            current = 0
+        async with UPLOAD_SEM:
+            async for chunk in response.content.iter_chunked(8 * 1024 * 1024):
+                total_bytes += len(chunk)
+                if total_bytes > MAX_VIDEO_SIZE:
+                    raise UnrecoverableError("Video file too large")
+                buffer += chunk
+                if len(buffer) >= part_size:
+                    if upload_id is None:
+                        multipart = await s3_client.create_multipart_upload(
+                            Bucket=bucket, Key=filename, ContentType=content_type
+                        )
+                        upload_id = multipart['UploadId']
+                    await upload_part()
+
+            if upload_id is None:
+                # Everything fit in one part, a plain PutObject is cheaper
+                await s3_client.put_object(Bucket=bucket, Key=filename, Body=bytes(buffer), ContentType=content_type)
+            else:
+                if buffer:
+                    await upload_part()
+                await s3_client.complete_multipart_upload(
+                    Bucket=bucket, Key=filename, UploadId=upload_id, MultipartUpload={'Parts': parts}
+                )
+    except (Exception, asyncio.CancelledError) as e:
+        if upload_id is not None:
+            try:
+                await s3_client.abort_multipart_upload(Bucket=bucket, Key=filename, UploadId=upload_id)
+            except ClientError as abort_error:
+                logger.warning("Failed to abort multipart upload for %s: %s", filename, abort_error)
+        if isinstance(e, ClientError):
+            error_code = e.response.get('Error', {}).get('Code')
+            logger.error("Error streaming %s to S3 (Code: %s): %s", filename, error_code, e, exc_info=True)
+        raise
+
+    url = s3_object_url(bucket, filename)
+    logger.info("Successfully streamed %s bytes to S3: %s", total_bytes, url)
+    return url
+
+
+def s3_object_url(bucket: str, filename: str) -> str:
+    """Public URL of an object in the configured S3 region."""
+    return f"https://{bucket}.s3.{AWS_REGION}.amazonaws.com/{urllib.parse.quote(filename)}"
+
+
+# In-memory HTML counter, loaded once in setup_hook. Numbers are handed out from blocks whose end is
+# persisted to COUNTER_FILE before any number in them is used, so after a crash the bot resumes past
+# every number it may have handed out and new S3 keys never overwrite existing uploads
+COUNTER_BLOCK_SIZE = 100
+html_counter = 0
+counter_reserved = 0
+counter_lock = asyncio.Lock()
+
+
+def _read_counter() -> int:
+    """Read the persisted HTML counter (blocking)."""
+    try:
+        with open(COUNTER_FILE, 'r') as f:
+            return int(f.read().strip())
+    except FileNotFoundError:
+        return 0
+
 
-        next_number = current + 1
+def _write_counter(value: int) -> None:
+    """Persist the HTML counter (blocking)."""
+    # Write to a temp file and swap it in so a crash never leaves a truncated counter
+    tmp_file = f"{COUNTER_FILE}.tmp"
+    with open(tmp_file, 'w') as f:
+        f.write(str(value))
+    os.replace(tmp_file, COUNTER_FILE)
 
-        with open(COUNTER_FILE, 'w') as f:
-            f.write(str(next_number))
 
-        return next_number
+async def load_counter() -> None:
+    """Load the HTML counter from disk off the event loop."""
+    global html_counter, counter_reserved
+    try:
+        html_counter = await asyncio.to_thread(_read_counter)
+        logger.info("Loaded HTML counter: %s", html_counter)
     except Exception as e:
-        logger.error(f"Error getting next HTML number: {e}")
-        # Fallback using timestamp seconds + milliseconds to reduce collision chance
-        return int(time.time() * 1000)
+        # Continue from a timestamp so new keys can't overwrite existing uploads
+        html_counter = int(time.time() * 1000)
+        logger.error("Error loading HTML counter, continuing from %s: %s", html_counter, e)
+    # The saved value is the end of the last reserved block, nothing past it was handed out
+    counter_reserved = html_counter
+
+
+async def get_next_html_number() -> int:
+    """Get the next available HTML number, reserving a new block on disk when the current one runs out."""
+    global html_counter, counter_reserved
+    async with counter_lock:
+        if html_counter >= counter_reserved:
+            reserved = html_counter + COUNTER_BLOCK_SIZE
+            # Raises if the block can't be saved - failing the upload beats reusing a key after a restart
+            await asyncio.to_thread(_write_counter, reserved)
+            counter_reserved = reserved
+        html_counter += 1
+        return html_counter
 
 
 # --- Bot Events ---
 @bot.event
 async def on_ready():
-    logger.info(f"Bot successfully logged in as {bot.user} (ID: {bot.user.id})")
+    logger.info("Bot successfully logged in as %s (ID: %s)", bot.user, bot.user.id)
     if not presence_loop.is_running():
         presence_loop.start()
     logger.info("------")
 
 
+# guild_id -> (checked_at, whether the bot may delete messages there). Entries are dropped when the bot's
+# roles may have changed, and expire after MANAGE_MESSAGES_TTL because role grants to the bot itself
+# (on_member_update) are only seen with the members intent, which this bot doesn't request
+MANAGE_MESSAGES_TTL = 60
+manage_messages_cache: dict[int, Tuple[float, bool]] = {}
+
+
+def can_manage_messages(guild: discord.Guild) -> bool:
+    """Cached check for the bot's Manage Messages permission in a guild."""
+    now = time.monotonic()
+    entry = manage_messages_cache.get(guild.id)
+    if entry is not None and now - entry[0] < MANAGE_MESSAGES_TTL:
+        return entry[1]
+    allowed = guild.me.guild_permissions.manage_messages
+    manage_messages_cache[guild.id] = (now, allowed)
+    return allowed
+
+
+@bot.event
+async def on_guild_role_update(before: discord.Role, after: discord.Role):
+    manage_messages_cache.pop(after.guild.id, None)
+
+
+@bot.event
+async def on_guild_role_delete(role: discord.Role):
+    manage_messages_cache.pop(role.guild.id, None)
+
+
+@bot.event
+async def on_member_update(before: discord.Member, after: discord.Member):
+    if after.id == bot.user.id:
+        manage_messages_cache.pop(after.guild.id, None)
+
+
+@bot.event
+async def on_guild_remove(guild: discord.Guild):
+    manage_messages_cache.pop(guild.id, None)
+
+
 # --- Message Processing ---
 @bot.event
 async def on_message(message: discord.Message):
@@ -552,37 +1009,53 @@ async def on_message(message: discord.Message):
     if message.guild and ALLOWED_GUILDS and message.guild.id not in ALLOWED_GUILDS:
         return
 
-    # Extract URLs using existing regexes
-    urls_found = set()
-    
-    # Combine regexes for efficiency
-    combined_regex = re.compile(
-        f"({TIKTOK_REGEX.pattern})|({FACEBOOK_REGEX.pattern})|({INSTAGRAM_REGEX.pattern})"
-    )
+    # Cheap substring check first - most messages contain no supported links
+    content = message.content
+    if not any(hint in content for hint in URL_HINTS):
+        return
+
+    # Extract URLs using existing regexes, remembering which provider each matched
+    urls_found = {}
 
     # Find all potential matches
-    for match in combined_regex.finditer(message.content):
+    for match in COMBINED_URL_REGEX.finditer(content):
         url = match.group(0)
         if url:
-             urls_found.add(url)
+             urls_found.setdefault(url, match.lastgroup)
+
+    # Skip links this channel already dispatched within RECENT_URL_WINDOW
+    now = time.monotonic()
+    while recent_urls and now - next(iter(recent_urls.values())) > RECENT_URL_WINDOW:
+        recent_urls.popitem(last=False)
+    for url in list(urls_found):
+        key = (message.channel.id, url)
+        if key in recent_urls:
+            logger.info("Skipping %s, already handled in channel %s", url, message.channel.id)
+            del urls_found[url]
+        else:
+            recent_urls[key] = now
+    while len(recent_urls) > RECENT_URLS_SIZE:
+        recent_urls.popitem(last=False)
 
     if urls_found:
-        logger.info(f"Found {len(urls_found)} potential video URL(s) in message from {message.author} ({message.author.id}) in channel {message.channel.id}")
-        # Process each unique URL found
-        for url in urls_found:
-             # Get the message content excluding *all* found URLs for clarity
-             clean_content = message.content
-             for found_url in urls_found:
-                  clean_content = clean_content.replace(found_url, '')
-             clean_content = clean_content.strip()
+        logger.info("Found %s potential video URL(s) in message from %s (%s) in channel %s", len(urls_found), message.author, message.author.id, message.channel.id)
+        # Get the message content excluding *all* found URLs for clarity (one pass)
+        clean_content = COMBINED_URL_REGEX.sub('', content).strip()
 
-             # Start handling this specific URL
-             asyncio.create_task(handle_video_url(message, url, clean_content))
+        # Process each unique URL found
+        for url, provider_name in urls_found.items():
+             # Start handling this specific URL, posting after the previous link in this channel
+             channel_id = message.channel.id
+             task = asyncio.create_task(handle_video_url(message, url, clean_content, provider_name,
+                                                         channel_tails.get(channel_id)))
+             channel_tails[channel_id] = task
+             task.add_done_callback(functools.partial(_forget_channel_tail, channel_id))
 
 
-async def handle_video_url(message: discord.Message, original_url: str, message_content: str = ""):
+async def handle_video_url(message: discord.Message, original_url: str, message_content: str = "", provider_name: Optional[str] = None,
+                           previous_task: Optional[asyncio.Task] = None):
     """Handles the processing of a video URL message, including retries and feedback."""
-    logger.info(f"Handling URL: {original_url} from message {message.id}")
+    logger.info("Handling URL: %s from message %s", original_url, message.id)
 
     # Add processing reaction immediately
     processing_reaction_added = False
@@ -590,21 +1063,24 @@ async def handle_video_url(message: discord.Message, original_url: str, message_
         await message.add_reaction("⏳")
         processing_reaction_added = True
     except discord.Forbidden:
-         logger.warning(f"Missing permissions to add reactions in channel {message.channel.id}")
+         logger.warning("Missing permissions to add reactions in channel %s", message.channel.id)
     except discord.NotFound:
-         logger.warning(f"Original message {message.id} not found, likely deleted.")
+         logger.warning("Original message %s not found, likely deleted.", message.id)
          return
     except Exception as e:
-        logger.error(f"Failed to add processing reaction to message {message.id}: {e}", exc_info=True)
+        logger.error("Failed to add processing reaction to message %s: %s", message.id, e, exc_info=True)
 
+    provider_name = provider_name or get_video_provider(original_url)
     success = False
     max_retries = 2
     last_error = None
+    attempt = 0
+    rate_limit_retries = 0
+    message_deleted = False
 
-    for attempt in range(max_retries):
+    while attempt < max_retries:
         try:
-            # Process the video URL
-            result_urls = await process_video_url(original_url, message_content, message.author.display_name)
+            result_urls = await get_video_urls(original_url, provider_name, message_content, message.author.display_name)
 
             if not result_urls or not all(result_urls):
                  raise Exception("Processing returned incomplete results")
@@ -613,64 +1089,90 @@ async def handle_video_url(message: discord.Message, original_url: str, message_
 
             # Format the message
             author_name = message.author.display_name
-            provider_name = get_video_provider(original_url)
 
             # Construct the message - Wrap html_url in <> to suppress its embed
+            links = f"[{provider_name}](<{html_url}>) | [MP4]({video_url})"
             if message_content:
-                base_len = len(f"{author_name}:  [{provider_name}](<{html_url}>) | [MP4]({video_url})")
-                max_content_len = 2000 - base_len
+                # Discord caps messages at 2000 characters: "<author>: <content> <links>"
+                max_content_len = 2000 - len(author_name) - len(links) - 3
                 if len(message_content) > max_content_len:
                     message_content = message_content[:max_content_len - 3] + "..."
-                hyperlink_message = f"{author_name}: {message_content} [{provider_name}](<{html_url}>) | [MP4]({video_url})"
+                hyperlink_message = f"{author_name}: {message_content} {links}"
             else:
-                hyperlink_message = f"{author_name}: [{provider_name}](<{html_url}>) | [MP4]({video_url})"
+                hyperlink_message = f"{author_name}: {links}"
+
+            # Keep replies in the order the links were posted in this channel
+            if previous_task is not None and not previous_task.done():
+                await asyncio.wait({previous_task}, timeout=POST_ORDER_TIMEOUT)
 
             # Send the message
             await message.channel.send(hyperlink_message, allowed_mentions=discord.AllowedMentions.none())
-            logger.info(f"Sent embed links for {original_url} to channel {message.channel.id}")
+            logger.info("Sent embed links for %s to channel %s", original_url, message.channel.id)
 
             # Delete original message (only in guilds, check permissions)
             if message.guild:
                 try:
                     # Check bot permissions before attempting delete
-                    bot_member = message.guild.me
-                    if bot_member.guild_permissions.manage_messages:
+                    if can_manage_messages(message.guild):
                          await message.delete()
-                         logger.debug(f"Deleted original message {message.id}")
+                         message_deleted = True
+                         logger.debug("Deleted original message %s", message.id)
                     else:
-                         logger.warning(f"Missing 'Manage Messages' permission in guild {message.guild.id} to delete original message.")
+                         logger.warning("Missing 'Manage Messages' permission in guild %s to delete original message.", message.guild.id)
                 except discord.Forbidden:
-                     logger.warning(f"Missing permissions to delete message {message.id} in channel {message.channel.id}")
+                     manage_messages_cache.pop(message.guild.id, None)
+                     logger.warning("Missing permissions to delete message %s in channel %s", message.id, message.channel.id)
                 except discord.NotFound:
-                     logger.warning(f"Original message {message.id} not found when attempting delete.")
+                     message_deleted = True
+                     logger.warning("Original message %s not found when attempting delete.", message.id)
                 except Exception as e:
-                     logger.error(f"Failed to delete message {message.id}: {e}", exc_info=True)
+                     logger.error("Failed to delete message %s: %s", message.id, e, exc_info=True)
 
             success = True
             break
 
+        except RateLimitedError as e:
+            last_error = e
+            rate_limit_retries += 1
+            if rate_limit_retries > RATE_LIMIT_MAX_RETRIES:
+                logger.warning("Still rate limited after %s waits for %s, giving up", RATE_LIMIT_MAX_RETRIES, original_url)
+                break
+            # Doesn't count against max_retries - the server told us exactly when to come back
+            wait_time = e.retry_after + random.uniform(0, RATE_LIMIT_JITTER)
+            logger.info("Rate limited, retrying %s in %.2f seconds...", original_url, wait_time)
+            await asyncio.sleep(wait_time)
+            continue
+
+        except UnrecoverableError as e:
+            last_error = e
+            logger.warning("Not retrying %s: %s", original_url, e)
+            break
+
         except Exception as e:
             last_error = e
-            logger.error(f"Attempt {attempt + 1}/{max_retries} failed for {original_url}: {e}", exc_info=True)
             if attempt < max_retries - 1:
-                wait_time = 1.5 ** attempt
-                logger.info(f"Retrying in {wait_time:.2f} seconds...")
+                # Retryable failures are expected (Cobalt errors are common), keep them cheap to log
+                logger.warning("Attempt %s/%s failed for %s: %s", attempt + 1, max_retries, original_url, e)
+                # Jitter keeps concurrent failures from retrying against Cobalt in lockstep
+                wait_time = min(RETRY_BACKOFF_BASE ** attempt * (1 + random.uniform(0, 0.5)), RETRY_MAX_DELAY)
+                logger.info("Retrying in %.2f seconds...", wait_time)
                 await asyncio.sleep(wait_time)
+            attempt += 1
 
-    # Cleanup reactions and send error message if all retries failed
-    if processing_reaction_added:
-        try:
-            await message.remove_reaction("⏳", bot.user)
-        except Exception:
-             pass
+    # Cleanup reactions and flag the message if all retries failed - a deleted message needs neither
+    reaction_updates = []
+    if processing_reaction_added and not message_deleted:
+        reaction_updates.append(message.remove_reaction("⏳", bot.user))
 
     if not success:
-        logger.error(f"All {max_retries} attempts failed for {original_url}. Last error: {last_error}")
-        try:
-            # Add error reaction
-            await message.add_reaction("❌")
-        except Exception:
-             pass
+        logger.error("All %s attempts failed for %s. Last error: %s", max_retries, original_url, last_error,
+                     exc_info=last_error)
+        recent_urls.pop((message.channel.id, original_url), None)
+        reaction_updates.append(message.add_reaction("❌"))
+
+    if reaction_updates:
+        # Independent REST calls, so send them together; failures here are not worth reporting
+        await asyncio.gather(*reaction_updates, return_exceptions=True)
 
 
 # Start the bot
@@ -2,8 +2,32 @@ import os
 import json
 from datetime import datetime
 from flask import Flask, render_template, jsonify, request, redirect, url_for
+from flask.json.provider import DefaultJSONProvider
 import threading
 import logging
+import time
+import heapq
+import gzip
+from collections import deque
+
+try:
+    import orjson
+    json_loads = orjson.loads
+
+    def json_dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+except ImportError:
+    orjson = None
+    json_loads = json.loads
+
+    def json_dumps(obj):
+        return json.dumps(obj, indent=2).encode()
+
+# Production WSGI server for the dashboard, the Werkzeug dev server is only a fallback
+try:
+    from waitress import serve as waitress_serve
+except ImportError:
+    waitress_serve = None
 
 # Set up Flask app
 app = Flask(__name__, 
@@ -11,6 +35,22 @@ app = Flask(__name__,
     template_folder="templates"
 )
 
+class OrjsonProvider(DefaultJSONProvider):
+    """jsonify through orjson, with Flask's own encoding for datetimes and other non-JSON types"""
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(
+            obj,
+            default=self.default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        ).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+# Every jsonify in the API goes through the C encoder when orjson is installed
+if orjson is not None:
+    app.json = OrjsonProvider(app)
+
 # Set URL prefix for all routes
 URL_PREFIX = '/musho'
 
@@ -18,6 +58,10 @@ URL_PREFIX = '/musho'
 app.config['PROPAGATE_EXCEPTIONS'] = True
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload
 
+# JSON responses smaller than this aren't worth gzipping
+GZIP_MIN_SIZE = 512
+GZIP_LEVEL = 6
+
 # Add a direct root route for debugging
 @app.route('/')
 def root_debug():
@@ -31,6 +75,23 @@ def handle_exception(e):
     logger.error(f"Unhandled exception in Flask app: {str(e)}", exc_info=True)
     return jsonify({"error": "Internal server error", "message": str(e)}), 500
 
+# Compress JSON API responses, guild and history payloads are very repetitive
+@app.after_request
+def gzip_json_response(response):
+    """Gzip JSON responses for clients that accept it"""
+    if response.mimetype != 'application/json' or response.status_code != 200 or response.direct_passthrough:
+        return response
+    response.vary.add('Accept-Encoding')
+    if 'Content-Encoding' in response.headers or 'gzip' not in request.headers.get('Accept-Encoding', ''):
+        return response
+    
+    data = response.get_data()
+    if len(data) < GZIP_MIN_SIZE:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=GZIP_LEVEL))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
+
 # Add a direct healthcheck route for debugging without URL prefix
 @app.route('/healthcheck')
 def direct_healthcheck():
@@ -48,6 +109,15 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Worker threads, open connection cap and idle connection timeout (seconds) for the dashboard's WSGI server
+DASHBOARD_THREADS = 8
+DASHBOARD_CONNECTION_LIMIT = 500
+DASHBOARD_CHANNEL_TIMEOUT = 60
+
+# How many recent songs are kept, globally and per server
+SONG_HISTORY_LIMIT = 8
+SERVER_SONG_HISTORY_LIMIT = 30
+
 # Dashboard data storage
 dashboard_data = {
     'bot_stats': {
@@ -59,468 +129,586 @@ dashboard_data = {
         'active_voice_channels': 0,
         'last_updated': int(datetime.now().timestamp())  # Add last updated timestamp for client-side change detection
     },
-    'song_history': [],
+    'song_history': deque(maxlen=SONG_HISTORY_LIMIT),
     'guild_stats': {},
-    'top_songs': [],
+    'top_songs': {},  # url -> entry, sorted on demand by sorted_top_songs()
     'server_stats': {} # New structure for per-server statistics
 }
 
-# Track which data has changed to avoid unnecessary updates
-data_changed = {
-    'bot_stats': True,
-    'song_history': False,
-    'guild_stats': False
-}
+# How many top songs are shown, and how many distinct songs are counted before the least played are dropped.
+# Every tracked entry is saved so a song's count survives restarts while it climbs toward the shown few,
+# which puts up to 500 global and 100 per-server entries in each save
+TOP_SONGS_LIMIT = 8
+TOP_SONGS_TRACKED = 500
+SERVER_TOP_SONGS_TRACKED = 100
+
+# Per-server fields that only describe the live session and are not saved
+TRANSIENT_SERVER_KEYS = frozenset({'is_currently_in_voice', 'voice_join_time', 'current_song'})
+
+# Where dashboard data is saved, and how long after a song play the save is delayed to batch rapid plays
+DASHBOARD_DATA_FILE = 'data/dashboard_data.json'
+SAVE_DEBOUNCE_DELAY = 5.0
+
+# Pending debounced save, and a lock so only one thread writes the file at a time
+_save_timer = None
+_save_timer_lock = threading.Lock()
+_save_file_lock = threading.Lock()
+
+# Set whenever saved data changes, so the auto-save thread sleeps while nothing happens
+AUTO_SAVE_INTERVAL = 300
+_unsaved_changes = threading.Event()
+
+# Bot state seen by the last full update_stats pass, and the guilds that were in voice then
+_last_fingerprint = None
+_voice_guild_ids = []
+
+# API polls arriving within this many seconds of the last stats pass reuse its result
+UPDATE_STATS_MIN_INTERVAL = 0.5
+_update_stats_lock = threading.Lock()
+_last_update_stats_time = 0.0
+
+# (last_updated, base, body) of the last /api/stats response, reused for every client polling the same version.
+# base is the version a delta was built on top of, only clients holding it can apply it. None for a full response
+_stats_response_cache = (None, None, None)
+
+# Track which data has changed to avoid unnecessary updates, one bit per section
+DIRTY_BOT_STATS = 0b001
+DIRTY_SONG_HISTORY = 0b010
+DIRTY_GUILD_STATS = 0b100
+DIRTY_ALL = DIRTY_BOT_STATS | DIRTY_SONG_HISTORY | DIRTY_GUILD_STATS
+data_changed = DIRTY_BOT_STATS
+
+# Guilds whose stats changed since the last /api/stats response, a client on that response's version gets only those.
+# Clients on any other version get everything, and every GUILD_STATS_FULL_EVERY-th delta carries all guilds
+# so clients can't drift for long
+changed_guild_ids = set()
+GUILD_STATS_FULL_EVERY = 10
+_guild_stats_sends = 0
+
+# Guards dashboard_data and the change tracking above. The bot's event loop writes them
+# while Flask and save threads read them, so every access happens under this lock
+_data_lock = threading.RLock()
 
 # Bot state management
 bot_instance = None
 
+# Guild id -> its string form, the key used throughout dashboard_data
+_guild_id_strs = {}
+
+def _guild_id_key(guild_id):
+    """String key for a guild id, formatted once per guild"""
+    key = _guild_id_strs.get(guild_id)
+    if key is None:
+        key = _guild_id_strs[guild_id] = str(guild_id)
+    return key
+
 def register_bot(bot):
     """Register the bot instance with the dashboard"""
     global bot_instance, dashboard_data, data_changed
     bot_instance = bot
     
     # Set the start timestamp once
-    dashboard_data['bot_stats']['start_timestamp'] = int(datetime.now().timestamp())
-    dashboard_data['bot_stats']['start_time'] = datetime.now()
-    
-    # Force initial update
-    for key in data_changed:
-        data_changed[key] = True
+    now = datetime.now()
+    with _data_lock:
+        dashboard_data['bot_stats']['start_timestamp'] = int(now.timestamp())
+        dashboard_data['bot_stats']['start_time'] = now
+        
+        # Force initial update
+        data_changed = DIRTY_ALL
     
     update_stats()
     logger.info("Bot registered with dashboard")
 
+def _connected_voice_guild_ids():
+    """Ids of the guilds the bot is connected to voice in, from its few voice clients instead of every guild"""
+    return {vc.guild.id for vc in bot_instance.voice_clients if vc.is_connected()}
+
+def _bot_state_fingerprint(voice_guild_ids):
+    """Per-guild snapshot of everything update_stats reads from the bot, to tell when a full pass is needed"""
+    queue_manager = getattr(bot_instance, 'queue_manager', None)
+    queues = queue_manager.queues if queue_manager else {}
+    current_songs = queue_manager.current_songs if queue_manager else {}
+    return tuple(
+        (
+            guild.id,
+            guild.member_count,
+            guild.id in voice_guild_ids,
+            len(queues.get(guild.id, ())),
+            getattr(current_songs.get(guild.id), 'url', None)
+        )
+        for guild in bot_instance.guilds
+    )
+
 def update_stats():
     """Update dashboard statistics from bot data"""
-    global bot_instance, dashboard_data, data_changed
+    global bot_instance, dashboard_data, data_changed, _last_fingerprint, _voice_guild_ids
 
     if not bot_instance:
         return
 
-    try:
-        # Capture current time once for all operations
-        current_time = datetime.now()
-        current_timestamp = int(current_time.timestamp())
-        
-        # Track if anything has changed
-        any_changes = False
-        
-        # Only recalculate these values if needed (when called through API endpoints)
-        # We no longer calculate uptime here - it will be done on the client side
-        
-        # Get guild count - only update if changed
-        guild_count = len(bot_instance.guilds)
-        if dashboard_data['bot_stats']['guilds'] != guild_count:
-            dashboard_data['bot_stats']['guilds'] = guild_count
-            data_changed['bot_stats'] = True
-            any_changes = True
-        
-        # Reset global counters for recalculation only when needed
-        total_songs_played = 0
-        total_queue_length = 0
-        active_voice = 0
-        
-        # Track guild changes
-        guild_changes = False
-        
-        # Gather guild-specific stats
-        for guild in bot_instance.guilds:
-            guild_id = str(guild.id)
-            # Check if we need to initialize server stats
-            if guild_id not in dashboard_data['server_stats']:
-                dashboard_data['server_stats'][guild_id] = {
-                    'name': guild.name,
-                    'member_count': guild.member_count,
-                    'songs_played': 0,
-                    'total_play_time': 0,  # In seconds
-                    'song_history': [],    # Server-specific history
-                    'top_songs': [],       # Server-specific top songs
-                    'last_active': current_time.strftime("%Y-%m-%d %H:%M:%S"),
-                    'queue_length': 0,
-                    'first_seen': current_time.strftime("%Y-%m-%d %H:%M:%S"),
-                    'total_bot_usage_time': 0,  # Total time in voice in seconds
-                    'is_currently_in_voice': False,
-                    'voice_join_time': None,
-                    'most_active_hours': [0] * 24  # Array to track activity by hour
-                }
-                guild_changes = True
-                any_changes = True
+    with _data_lock:
+        try:
+            # Capture current time once for all operations
+            current_time = datetime.now()
             
-            # Also maintain the original guild_stats for backward compatibility
-            if guild_id not in dashboard_data['guild_stats']:
-                dashboard_data['guild_stats'][guild_id] = {
-                    'name': guild.name,
-                    'member_count': guild.member_count,
-                    'songs_played': 0,
-                    'queue_length': 0
-                }
-                guild_changes = True
-                any_changes = True
-                
-            # Check if member count has changed
-            if dashboard_data['server_stats'][guild_id]['member_count'] != guild.member_count:
-                dashboard_data['server_stats'][guild_id]['member_count'] = guild.member_count
-                dashboard_data['guild_stats'][guild_id]['member_count'] = guild.member_count
-                guild_changes = True
+            # Skip the per-guild pass when the bot looks the same as last time, only counting voice activity
+            connected_voice_ids = _connected_voice_guild_ids()
+            fingerprint = _bot_state_fingerprint(connected_voice_ids)
+            if fingerprint == _last_fingerprint:
+                current_hour = current_time.hour
+                for guild_id in _voice_guild_ids:
+                    dashboard_data['server_stats'][guild_id]['most_active_hours'][current_hour] += 1
+                if _voice_guild_ids:
+                    _unsaved_changes.set()
+                return
+            
+            current_timestamp = int(current_time.timestamp())
+            current_time_str = current_time.strftime("%Y-%m-%d %H:%M:%S")
+            
+            # Track if anything has changed
+            any_changes = False
+            
+            # Only recalculate these values if needed (when called through API endpoints)
+            # We no longer calculate uptime here - it will be done on the client side
+            
+            # Bind the containers used on every iteration once
+            bot_stats = dashboard_data['bot_stats']
+            all_server_stats = dashboard_data['server_stats']
+            all_guild_stats = dashboard_data['guild_stats']
+            
+            # Get guild count - only update if changed
+            guild_count = len(bot_instance.guilds)
+            if bot_stats['guilds'] != guild_count:
+                bot_stats['guilds'] = guild_count
+                data_changed |= DIRTY_BOT_STATS
                 any_changes = True
-                
-            # Check voice client status - only update if there are changes
-            old_voice_status = dashboard_data['server_stats'][guild_id]['is_currently_in_voice']
-            current_in_voice = guild.voice_client and guild.voice_client.is_connected()
             
-            if current_in_voice:
-                active_voice += 1
-                current_hour = current_time.hour
-                
-                # Only update if voice status changed
-                if not old_voice_status:
-                    # Bot just joined voice
-                    dashboard_data['server_stats'][guild_id]['is_currently_in_voice'] = True
-                    dashboard_data['server_stats'][guild_id]['voice_join_time'] = current_timestamp
-                    dashboard_data['server_stats'][guild_id]['last_active'] = current_time.strftime("%Y-%m-%d %H:%M:%S")
-                    guild_changes = True
+            # Reset global counters for recalculation only when needed
+            # (total_songs_played is kept up to date by record_song_played)
+            total_queue_length = 0
+            active_voice = 0
+            
+            # Track guild changes
+            guild_changes = set()
+            voice_guild_ids = []
+            
+            # Gather guild-specific stats
+            for guild in bot_instance.guilds:
+                guild_id = _guild_id_key(guild.id)
+                # Check if we need to initialize server stats
+                server_stat = all_server_stats.get(guild_id)
+                if server_stat is None:
+                    server_stat = all_server_stats[guild_id] = {
+                        'name': guild.name,
+                        'member_count': guild.member_count,
+                        'songs_played': 0,
+                        'total_play_time': 0,  # In seconds
+                        'song_history': deque(maxlen=SERVER_SONG_HISTORY_LIMIT),    # Server-specific history
+                        'top_songs': {},       # Server-specific top songs (url -> entry)
+                        'last_active': current_time_str,
+                        'queue_length': 0,
+                        'first_seen': current_time_str,
+                        'total_bot_usage_time': 0,  # Total time in voice in seconds
+                        'is_currently_in_voice': False,
+                        'voice_join_time': None,
+                        'most_active_hours': [0] * 24  # Array to track activity by hour
+                    }
+                    guild_changes.add(guild_id)
                     any_changes = True
                 
-                # Track activity by hour
-                dashboard_data['server_stats'][guild_id]['most_active_hours'][current_hour] += 1
-            else:
-                # Bot is not in voice
-                if old_voice_status:
-                    # Bot just left voice, calculate session duration
-                    join_time = dashboard_data['server_stats'][guild_id]['voice_join_time']
-                    if join_time:
-                        session_duration = current_timestamp - join_time
-                        dashboard_data['server_stats'][guild_id]['total_bot_usage_time'] += session_duration
+                # Also maintain the original guild_stats for backward compatibility
+                guild_stat = all_guild_stats.get(guild_id)
+                if guild_stat is None:
+                    guild_stat = all_guild_stats[guild_id] = {
+                        'name': guild.name,
+                        'member_count': guild.member_count,
+                        'songs_played': 0,
+                        'queue_length': 0
+                    }
+                    guild_changes.add(guild_id)
+                    any_changes = True
                     
-                    # Reset voice tracking
-                    dashboard_data['server_stats'][guild_id]['is_currently_in_voice'] = False
-                    dashboard_data['server_stats'][guild_id]['voice_join_time'] = None
-                    guild_changes = True
+                # Check if member count has changed
+                if server_stat['member_count'] != guild.member_count:
+                    server_stat['member_count'] = guild.member_count
+                    guild_stat['member_count'] = guild.member_count
+                    guild_changes.add(guild_id)
                     any_changes = True
+                    
+                # Check voice client status - only update if there are changes
+                old_voice_status = server_stat['is_currently_in_voice']
+                current_in_voice = guild.id in connected_voice_ids
                 
-            # Update queue length for this guild - only if changed
-            if hasattr(bot_instance, 'queue_manager'):
-                queue = bot_instance.queue_manager.queues.get(guild.id, [])
-                queue_length = len(queue)
-                
-                if dashboard_data['guild_stats'][guild_id]['queue_length'] != queue_length:
-                    dashboard_data['guild_stats'][guild_id]['queue_length'] = queue_length
-                    dashboard_data['server_stats'][guild_id]['queue_length'] = queue_length
-                    total_queue_length += queue_length
-                    guild_changes = True
-                    any_changes = True
+                if current_in_voice:
+                    active_voice += 1
+                    voice_guild_ids.append(guild_id)
+                    current_hour = current_time.hour
+                    
+                    # Only update if voice status changed
+                    if not old_voice_status:
+                        # Bot just joined voice
+                        server_stat['is_currently_in_voice'] = True
+                        server_stat['voice_join_time'] = current_timestamp
+                        server_stat['last_active'] = current_time_str
+                        guild_changes.add(guild_id)
+                        any_changes = True
+                    
+                    # Track activity by hour
+                    server_stat['most_active_hours'][current_hour] += 1
                 else:
-                    total_queue_length += queue_length
-                
-                # Get current song if any - only update if changed
-                current_song = bot_instance.queue_manager.current_songs.get(guild.id)
-                current_song_url = current_song.url if current_song else None
-                existing_song_url = dashboard_data['guild_stats'].get(guild_id, {}).get('current_song', {}).get('url')
-                
-                if current_song_url != existing_song_url:
-                    if current_song:
-                        # Extract artist and title from the song title (usually in format "Artist - Title")
-                        title_parts = current_song.title.split(" - ", 1)
-                        artist = title_parts[0] if len(title_parts) > 1 else "Unknown Artist"
-                        title = title_parts[1] if len(title_parts) > 1 else current_song.title
-                        
-                        # We don't calculate progress here anymore - this will be done client-side
+                    # Bot is not in voice
+                    if old_voice_status:
+                        # Bot just left voice, calculate session duration
+                        join_time = server_stat['voice_join_time']
+                        if join_time:
+                            session_duration = current_timestamp - join_time
+                            server_stat['total_bot_usage_time'] += session_duration
                         
-                        # Determine if this is from Spotify, YouTube, etc.
-                        source = "YouTube"
-                        if hasattr(current_song, 'url') and "spotify.com" in current_song.url:
-                            source = "Spotify"
-                        
-                        # Extract duration in seconds for client-side calculation
-                        duration_seconds = 0
-                        if hasattr(current_song, 'duration') and current_song.duration:
-                            duration_parts = current_song.duration.split(':')
-                            if len(duration_parts) == 2:
-                                try:
-                                    duration_seconds = int(duration_parts[0]) * 60 + int(duration_parts[1])
-                                except ValueError:
-                                    duration_seconds = 0
-                        
-                        # Set start timestamp for client-side calculations
-                        start_timestamp = current_timestamp
-                        
-                        # Create rich metadata object
-                        current_song_data = {
-                            'title': title,
-                            'artist': artist,
-                            'full_title': current_song.title,
-                            'url': current_song.url,
-                            'duration': current_song.duration,
-                            'duration_seconds': duration_seconds,  # Add duration in seconds
-                            'thumbnail': current_song.thumbnail,
-                            'started_at': current_time.strftime("%Y-%m-%d %H:%M:%S"),
-                            'start_time_unix': start_timestamp,
-                            'source': source
-                        }
-                        dashboard_data['guild_stats'][guild_id]['current_song'] = current_song_data
-                        dashboard_data['server_stats'][guild_id]['current_song'] = current_song_data
+                        # Reset voice tracking
+                        server_stat['is_currently_in_voice'] = False
+                        server_stat['voice_join_time'] = None
+                        guild_changes.add(guild_id)
+                        any_changes = True
+                    
+                # Update queue length for this guild - only if changed
+                if hasattr(bot_instance, 'queue_manager'):
+                    queue = bot_instance.queue_manager.queues.get(guild.id, [])
+                    queue_length = len(queue)
+                    
+                    if guild_stat['queue_length'] != queue_length:
+                        guild_stat['queue_length'] = queue_length
+                        server_stat['queue_length'] = queue_length
+                        total_queue_length += queue_length
+                        guild_changes.add(guild_id)
+                        any_changes = True
                     else:
-                        for stats_dict in [dashboard_data['guild_stats'][guild_id], dashboard_data['server_stats'][guild_id]]:
-                            if 'current_song' in stats_dict:
-                                stats_dict.pop('current_song')
+                        total_queue_length += queue_length
                     
-                    guild_changes = True
-                    any_changes = True
-            
-            # Add to global counters
-            total_songs_played += dashboard_data['server_stats'][guild_id]['songs_played']
-        
-        # Update global stats - only if changed
-        if dashboard_data['bot_stats']['active_voice_channels'] != active_voice:
-            dashboard_data['bot_stats']['active_voice_channels'] = active_voice
-            data_changed['bot_stats'] = True
-            any_changes = True
+                    # Get current song if any - only update if changed
+                    current_song = bot_instance.queue_manager.current_songs.get(guild.id)
+                    current_song_url = current_song.url if current_song else None
+                    existing_song_url = guild_stat.get('current_song', {}).get('url')
+                    
+                    if current_song_url != existing_song_url:
+                        if current_song:
+                            # Artist and title are split from "Artist - Title" once, when the song is created
+                            artist = current_song.artist
+                            title = current_song.track_title
+                            
+                            # We don't calculate progress here anymore - this will be done client-side
+                            
+                            # Determine if this is from Spotify, YouTube, etc.
+                            source = "YouTube"
+                            if hasattr(current_song, 'url') and "spotify.com" in current_song.url:
+                                source = "Spotify"
+                            
+                            # Duration in seconds for client-side calculation, parsed once when the song is created
+                            duration_seconds = current_song.duration_seconds
+                            
+                            # Set start timestamp for client-side calculations
+                            start_timestamp = current_timestamp
+                            
+                            # Create rich metadata object
+                            current_song_data = {
+                                'title': title,
+                                'artist': artist,
+                                'full_title': current_song.title,
+                                'url': current_song.url,
+                                'duration': current_song.duration,
+                                'duration_seconds': duration_seconds,  # Add duration in seconds
+                                'thumbnail': current_song.thumbnail,
+                                'started_at': current_time_str,
+                                'start_time_unix': start_timestamp,
+                                'source': source
+                            }
+                            guild_stat['current_song'] = current_song_data
+                            server_stat['current_song'] = current_song_data
+                        else:
+                            guild_stat.pop('current_song', None)
+                            server_stat.pop('current_song', None)
+                        
+                        guild_changes.add(guild_id)
+                        any_changes = True
             
-        if dashboard_data['bot_stats']['total_songs_played'] != total_songs_played:
-            dashboard_data['bot_stats']['total_songs_played'] = total_songs_played
-            data_changed['bot_stats'] = True
-            any_changes = True
+            # Update global stats - only if changed
+            if bot_stats['active_voice_channels'] != active_voice:
+                bot_stats['active_voice_channels'] = active_voice
+                data_changed |= DIRTY_BOT_STATS
+                any_changes = True
+                
+            if bot_stats.get('total_queue_length', 0) != total_queue_length:
+                bot_stats['total_queue_length'] = total_queue_length
+                data_changed |= DIRTY_BOT_STATS
+                any_changes = True
+                
+            # Update guild_stats changed flag
+            if guild_changes:
+                changed_guild_ids.update(guild_changes)
+                data_changed |= DIRTY_GUILD_STATS
+                
+            # Update last_updated timestamp if any changes occurred
+            if any_changes:
+                bot_stats['last_updated'] = current_timestamp
             
-        if dashboard_data['bot_stats'].get('total_queue_length', 0) != total_queue_length:
-            dashboard_data['bot_stats']['total_queue_length'] = total_queue_length
-            data_changed['bot_stats'] = True
-            any_changes = True
+            # Hourly activity counts moved too if any guild is in voice
+            if any_changes or voice_guild_ids:
+                _unsaved_changes.set()
             
-        # Update guild_stats changed flag
-        if guild_changes:
-            data_changed['guild_stats'] = True
+            _last_fingerprint = fingerprint
+            _voice_guild_ids = voice_guild_ids
             
-        # Update last_updated timestamp if any changes occurred
-        if any_changes:
-            dashboard_data['bot_stats']['last_updated'] = current_timestamp
-        
-        logger.debug("Dashboard stats updated successfully")
-    except Exception as e:
-        logger.error(f"Error updating dashboard stats: {e}")
+            logger.debug("Dashboard stats updated successfully")
+        except Exception as e:
+            logger.error(f"Error updating dashboard stats: {e}")
+
+def refresh_stats():
+    """Run update_stats for an API request, coalescing polls that arrive together into one pass"""
+    global _last_update_stats_time
+    if time.monotonic() - _last_update_stats_time < UPDATE_STATS_MIN_INTERVAL:
+        return
+    
+    # Requests arriving while a pass runs wait for it and then reuse its result
+    with _update_stats_lock:
+        if time.monotonic() - _last_update_stats_time < UPDATE_STATS_MIN_INTERVAL:
+            return
+        update_stats()
+        _last_update_stats_time = time.monotonic()
+
+def count_top_song(top_songs, song, max_tracked):
+    """Count a play in a url -> entry top songs map, dropping the least played songs past max_tracked"""
+    entry = top_songs.get(song.url)
+    if entry:
+        entry['play_count'] += 1
+        return
+    
+    top_songs[song.url] = {
+        'title': song.title,
+        'url': song.url,
+        'thumbnail': song.thumbnail,
+        'play_count': 1
+    }
+    
+    if len(top_songs) > max_tracked:
+        # Prune down to 80% in one go so this sort doesn't run for every new song
+        keep = int(max_tracked * 0.8)
+        for least_played in sorted(top_songs.values(), key=lambda x: x['play_count'])[:len(top_songs) - keep]:
+            del top_songs[least_played['url']]
+
+def sorted_top_songs(top_songs, limit):
+    """Most played entries of a url -> entry top songs map, highest play count first"""
+    return heapq.nlargest(limit, top_songs.values(), key=lambda x: x['play_count'])
 
 def record_song_played(guild_id, song):
     """Record information about a played song"""
     global dashboard_data, data_changed
     
-    try:
-        # Increment total songs played count
-        dashboard_data['bot_stats']['total_songs_played'] += 1
-        data_changed['bot_stats'] = True
-        
-        # Process guild-specific statistics
-        guild_id_str = str(guild_id)
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        # Get guild name
-        guild_name = dashboard_data['guild_stats'].get(guild_id_str, {}).get('name', 'Unknown Server')
-        
-        # Create song entry
-        song_entry = {
-            'title': song.title,
-            'url': song.url,
-            'timestamp': timestamp,
-            'timestamp_unix': int(datetime.now().timestamp()),  # Add Unix timestamp
-            'guild': guild_name,
-            'thumbnail': song.thumbnail,
-            'guild_id': guild_id_str
-        }
-        
-        # Update existing guild stats (backward compatibility)
-        if guild_id_str in dashboard_data['guild_stats']:
-            dashboard_data['guild_stats'][guild_id_str]['songs_played'] += 1
-            data_changed['guild_stats'] = True
-        
-        # Update new per-server stats
-        if guild_id_str in dashboard_data['server_stats']:
-            server_stats = dashboard_data['server_stats'][guild_id_str]
+    with _data_lock:
+        try:
+            # Increment total songs played count
+            dashboard_data['bot_stats']['total_songs_played'] += 1
+            data_changed |= DIRTY_BOT_STATS
             
-            # Update songs played counter
-            server_stats['songs_played'] += 1
-            server_stats['last_active'] = timestamp
+            # Capture current time once for all operations
+            now = datetime.now()
+            now_ts = int(now.timestamp())
+            now_str = now.strftime("%Y-%m-%d %H:%M:%S")
             
-            # Add to server-specific song history
-            server_stats['song_history'].insert(0, song_entry.copy())
-            server_stats['song_history'] = server_stats['song_history'][:30]  # Keep last 30 per server
+            # Process guild-specific statistics
+            guild_id_str = _guild_id_key(guild_id)
             
-            # Update server-specific top songs
-            song_found = False
-            for top_song in server_stats['top_songs']:
-                if top_song['url'] == song.url:
-                    top_song['play_count'] += 1
-                    song_found = True
-                    break
-                    
-            if not song_found:
-                server_stats['top_songs'].append({
-                    'title': song.title,
-                    'url': song.url,
-                    'thumbnail': song.thumbnail,
-                    'play_count': 1
-                })
-                
-            # Sort server top songs by play count
-            server_stats['top_songs'] = sorted(
-                server_stats['top_songs'], 
-                key=lambda x: x['play_count'], 
-                reverse=True
-            )[:15]  # Keep only top 15 songs per server
-        
-        # Add to global history, keeping most recent 8
-        dashboard_data['song_history'].insert(0, song_entry)
-        dashboard_data['song_history'] = dashboard_data['song_history'][:8]
-        data_changed['song_history'] = True
-        
-        # Update global top songs
-        song_found = False
-        for top_song in dashboard_data['top_songs']:
-            if top_song['url'] == song.url:
-                top_song['play_count'] += 1
-                song_found = True
-                break
-                
-        if not song_found:
-            dashboard_data['top_songs'].append({
+            # Get guild name
+            guild_name = dashboard_data['guild_stats'].get(guild_id_str, {}).get('name', 'Unknown Server')
+            
+            # Create song entry
+            song_entry = {
                 'title': song.title,
                 'url': song.url,
+                'timestamp': now_str,
+                'timestamp_unix': now_ts,  # Add Unix timestamp
+                'guild': guild_name,
                 'thumbnail': song.thumbnail,
-                'play_count': 1
-            })
+                'guild_id': guild_id_str
+            }
             
-        # Sort global top songs by play count
-        dashboard_data['top_songs'] = sorted(
-            dashboard_data['top_songs'], 
-            key=lambda x: x['play_count'], 
-            reverse=True
-        )[:8]  # Keep only top 8 songs
-        
-        # Update last_updated timestamp
-        dashboard_data['bot_stats']['last_updated'] = int(datetime.now().timestamp())
-        
-        logger.debug(f"Recorded song: {song.title}")
-    except Exception as e:
-        logger.error(f"Error recording song play: {e}")
+            # Update existing guild stats (backward compatibility)
+            if guild_id_str in dashboard_data['guild_stats']:
+                dashboard_data['guild_stats'][guild_id_str]['songs_played'] += 1
+                changed_guild_ids.add(guild_id_str)
+                data_changed |= DIRTY_GUILD_STATS
+            
+            # Update new per-server stats
+            if guild_id_str in dashboard_data['server_stats']:
+                server_stats = dashboard_data['server_stats'][guild_id_str]
+                
+                # Update songs played counter
+                server_stats['songs_played'] += 1
+                server_stats['last_active'] = now_str
+                
+                # Add to server-specific song history
+                # History entries are never modified after this, so the server and global histories share one dict
+                server_stats['song_history'].appendleft(song_entry)  # deque keeps the last 30 per server
+                
+                # Update server-specific top songs
+                count_top_song(server_stats['top_songs'], song, SERVER_TOP_SONGS_TRACKED)
+            
+            # Add to global history, keeping most recent 8
+            dashboard_data['song_history'].appendleft(song_entry)
+            data_changed |= DIRTY_SONG_HISTORY
+            
+            # Update global top songs
+            count_top_song(dashboard_data['top_songs'], song, TOP_SONGS_TRACKED)
+            
+            # Update last_updated timestamp
+            dashboard_data['bot_stats']['last_updated'] = now_ts
+            
+            # Persist soon, off the bot's event loop
+            _unsaved_changes.set()
+            schedule_save()
+            
+            logger.debug(f"Recorded song: {song.title}")
+        except Exception as e:
+            logger.error(f"Error recording song play: {e}")
 
 # Save and load dashboard data
+def schedule_save():
+    """Save dashboard data in a background thread after a short delay, batching saves requested meanwhile"""
+    global _save_timer
+    with _save_timer_lock:
+        if _save_timer is not None:
+            return
+        _save_timer = threading.Timer(SAVE_DEBOUNCE_DELAY, _run_scheduled_save)
+        _save_timer.daemon = True
+        _save_timer.start()
+
+def _run_scheduled_save():
+    """Timer callback for schedule_save"""
+    global _save_timer
+    with _save_timer_lock:
+        _save_timer = None
+    save_dashboard_data()
+
 def save_dashboard_data():
     """Save dashboard data to disk"""
+    # Cleared before the snapshot, so changes made while saving are caught by the next save
+    _unsaved_changes.clear()
     try:
-        # Create a serializable copy of the data, preserving all important metrics
-        data_to_save = {
-            'bot_stats': {
-                'total_songs_played': dashboard_data['bot_stats']['total_songs_played'],
-                'uptime': dashboard_data['bot_stats']['uptime'],
-                'guilds': dashboard_data['bot_stats']['guilds'],
-                'active_voice_channels': dashboard_data['bot_stats']['active_voice_channels'],
-                # Save the start time as a string that can be parsed later
-                'start_time': dashboard_data['bot_stats']['start_time'].strftime("%Y-%m-%d %H:%M:%S")
-            },
-            'song_history': dashboard_data['song_history'],
-            'top_songs': dashboard_data['top_songs'],
-            'guild_stats': dashboard_data['guild_stats'],
-            'server_stats': {}
-        }
-        
-        # Process server stats (include everything except transient data)
-        for guild_id, stats in dashboard_data['server_stats'].items():
-            # Create a copy of the stats that can be serialized
-            server_data = {
-                'name': stats.get('name', 'Unknown Server'),
-                'member_count': stats.get('member_count', 0),
-                'songs_played': stats.get('songs_played', 0),
-                'total_play_time': stats.get('total_play_time', 0),
-                'song_history': stats.get('song_history', []),
-                'top_songs': stats.get('top_songs', []),
-                'last_active': stats.get('last_active', ''),
-                'queue_length': stats.get('queue_length', 0),
-                'first_seen': stats.get('first_seen', ''),
-                'total_bot_usage_time': stats.get('total_bot_usage_time', 0),
-                'most_active_hours': stats.get('most_active_hours', [0] * 24)
+        # Serialized under the lock, the bot keeps changing the nested dicts otherwise
+        with _data_lock:
+            # Create a serializable copy of the data, preserving all important metrics
+            data_to_save = {
+                'bot_stats': {
+                    'total_songs_played': dashboard_data['bot_stats']['total_songs_played'],
+                    'uptime': dashboard_data['bot_stats']['uptime'],
+                    'guilds': dashboard_data['bot_stats']['guilds'],
+                    'active_voice_channels': dashboard_data['bot_stats']['active_voice_channels'],
+                    # Save the start time as a string that can be parsed later
+                    'start_time': dashboard_data['bot_stats']['start_time'].strftime("%Y-%m-%d %H:%M:%S")
+                },
+                'song_history': list(dashboard_data['song_history']),
+                'top_songs': list(dashboard_data['top_songs'].values()),
+                'guild_stats': dashboard_data['guild_stats'],
+                'server_stats': {}
             }
             
-            # Skip transient data like is_currently_in_voice, voice_join_time, and current_song
-            # These will be reinitialized when the bot reconnects
+            # Process server stats (include everything except transient data)
+            for guild_id, stats in dashboard_data['server_stats'].items():
+                # Shallow copy without the transient fields, which are reinitialized when the bot reconnects
+                server_data = {key: value for key, value in stats.items() if key not in TRANSIENT_SERVER_KEYS}
+                # History and top songs are kept as a deque and a url -> entry map, saved as plain lists.
+                # Loading rebuilds the map, so top songs are saved unsorted
+                server_data['song_history'] = list(stats['song_history'])
+                server_data['top_songs'] = list(stats['top_songs'].values())
+                
+                data_to_save['server_stats'][guild_id] = server_data
             
-            data_to_save['server_stats'][guild_id] = server_data
+            payload = json_dumps(data_to_save)
         
-        # Save to file with pretty indentation
-        os.makedirs('data', exist_ok=True)
-        with open('data/dashboard_data.json', 'w') as f:
-            json.dump(data_to_save, f, indent=2)
+        # Save to a temporary file and swap it in, so a crash mid-write never leaves a truncated file
+        tmp_file = DASHBOARD_DATA_FILE + '.tmp'
+        with _save_file_lock:
+            os.makedirs(os.path.dirname(DASHBOARD_DATA_FILE), exist_ok=True)
+            with open(tmp_file, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_file, DASHBOARD_DATA_FILE)
         logger.info("Dashboard data saved successfully")
     except Exception as e:
+        _unsaved_changes.set()
         logger.error(f"Error saving dashboard data: {e}")
 
 def load_dashboard_data():
     """Load dashboard data from disk"""
     global dashboard_data
     try:
-        if os.path.exists('data/dashboard_data.json'):
-            with open('data/dashboard_data.json', 'r') as f:
-                loaded_data = json.load(f)
-                
-            # Update the bot stats
-            if 'bot_stats' in loaded_data:
-                # Keep the current start time, but restore the total_songs_played count
-                dashboard_data['bot_stats']['total_songs_played'] = loaded_data['bot_stats'].get('total_songs_played', 0)
-                dashboard_data['bot_stats']['guilds'] = loaded_data['bot_stats'].get('guilds', 0)
-                
-                # Convert the start_time string back to datetime if present
-                if 'start_time' in loaded_data['bot_stats']:
-                    try:
-                        saved_start_time = datetime.strptime(loaded_data['bot_stats']['start_time'], "%Y-%m-%d %H:%M:%S")
-                        # Calculate how long the bot was down
-                        downtime = (datetime.now() - saved_start_time)
-                        logger.info(f"Bot was down for: {str(downtime).split('.')[0]}")
-                    except Exception as e:
-                        logger.error(f"Error parsing start_time: {e}")
-            
-            # Restore song history
-            if 'song_history' in loaded_data:
-                dashboard_data['song_history'] = loaded_data['song_history']
-                
-            # Restore top songs
-            if 'top_songs' in loaded_data:
-                dashboard_data['top_songs'] = loaded_data['top_songs']
-                
-            # Restore guild stats (legacy)
-            if 'guild_stats' in loaded_data:
-                dashboard_data['guild_stats'] = loaded_data['guild_stats']
-                
-            # Restore detailed server stats
-            if 'server_stats' in loaded_data:
-                # For each server in the loaded data
-                for guild_id, stats in loaded_data['server_stats'].items():
-                    # Initialize the entry if it doesn't exist
-                    if guild_id not in dashboard_data['server_stats']:
-                        dashboard_data['server_stats'][guild_id] = {
-                            'name': stats.get('name', 'Unknown Server'),
-                            'member_count': stats.get('member_count', 0),
-                            'songs_played': 0,
-                            'total_play_time': 0,
-                            'song_history': [],
-                            'top_songs': [],
-                            'last_active': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                            'queue_length': 0,
-                            'first_seen': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                            'total_bot_usage_time': 0,
-                            'is_currently_in_voice': False,
-                            'voice_join_time': None,
-                            'most_active_hours': [0] * 24
-                        }
+        now = datetime.now()
+        now_str = now.strftime("%Y-%m-%d %H:%M:%S")
+        
+        with _data_lock:
+            if os.path.exists(DASHBOARD_DATA_FILE):
+                with open(DASHBOARD_DATA_FILE, 'rb') as f:
+                    loaded_data = json_loads(f.read())
+                    
+                # Update the bot stats
+                if 'bot_stats' in loaded_data:
+                    # Keep the current start time, but restore the total_songs_played count
+                    dashboard_data['bot_stats']['total_songs_played'] = loaded_data['bot_stats'].get('total_songs_played', 0)
+                    dashboard_data['bot_stats']['guilds'] = loaded_data['bot_stats'].get('guilds', 0)
                     
-                    # Update with loaded data
-                    server_stats = dashboard_data['server_stats'][guild_id]
-                    server_stats['songs_played'] = stats.get('songs_played', 0)
-                    server_stats['total_play_time'] = stats.get('total_play_time', 0)
-                    server_stats['song_history'] = stats.get('song_history', [])
-                    server_stats['top_songs'] = stats.get('top_songs', [])
-                    server_stats['last_active'] = stats.get('last_active', server_stats['last_active'])
-                    server_stats['first_seen'] = stats.get('first_seen', server_stats['first_seen'])
-                    server_stats['total_bot_usage_time'] = stats.get('total_bot_usage_time', 0)
-                    server_stats['most_active_hours'] = stats.get('most_active_hours', [0] * 24)
+                    # Convert the start_time string back to datetime if present
+                    if 'start_time' in loaded_data['bot_stats']:
+                        try:
+                            saved_start_time = datetime.strptime(loaded_data['bot_stats']['start_time'], "%Y-%m-%d %H:%M:%S")
+                            # Calculate how long the bot was down
+                            downtime = (now - saved_start_time)
+                            logger.info(f"Bot was down for: {str(downtime).split('.')[0]}")
+                        except Exception as e:
+                            logger.error(f"Error parsing start_time: {e}")
                 
-            logger.info("Dashboard data loaded successfully")
+                # Restore song history
+                if 'song_history' in loaded_data:
+                    dashboard_data['song_history'] = deque(loaded_data['song_history'], maxlen=SONG_HISTORY_LIMIT)
+                    
+                # Restore top songs
+                if 'top_songs' in loaded_data:
+                    dashboard_data['top_songs'] = {entry['url']: entry for entry in loaded_data['top_songs']}
+                    
+                # Restore guild stats (legacy)
+                if 'guild_stats' in loaded_data:
+                    dashboard_data['guild_stats'] = loaded_data['guild_stats']
+                    
+                # Restore detailed server stats
+                if 'server_stats' in loaded_data:
+                    # For each server in the loaded data
+                    for guild_id, stats in loaded_data['server_stats'].items():
+                        # Initialize the entry if it doesn't exist
+                        if guild_id not in dashboard_data['server_stats']:
+                            dashboard_data['server_stats'][guild_id] = {
+                                'name': stats.get('name', 'Unknown Server'),
+                                'member_count': stats.get('member_count', 0),
+                                'songs_played': 0,
+                                'total_play_time': 0,
+                                'song_history': deque(maxlen=SERVER_SONG_HISTORY_LIMIT),
+                                'top_songs': {},
+                                'last_active': now_str,
+                                'queue_length': 0,
+                                'first_seen': now_str,
+                                'total_bot_usage_time': 0,
+                                'is_currently_in_voice': False,
+                                'voice_join_time': None,
+                                'most_active_hours': [0] * 24
+                            }
+                        
+                        # Update with loaded data
+                        server_stats = dashboard_data['server_stats'][guild_id]
+                        server_stats['songs_played'] = stats.get('songs_played', 0)
+                        server_stats['total_play_time'] = stats.get('total_play_time', 0)
+                        server_stats['song_history'] = deque(stats.get('song_history', []), maxlen=SERVER_SONG_HISTORY_LIMIT)
+                        server_stats['top_songs'] = {entry['url']: entry for entry in stats.get('top_songs', [])}
+                        server_stats['last_active'] = stats.get('last_active', server_stats['last_active'])
+                        server_stats['first_seen'] = stats.get('first_seen', server_stats['first_seen'])
+                        server_stats['total_bot_usage_time'] = stats.get('total_bot_usage_time', 0)
+                        server_stats['most_active_hours'] = stats.get('most_active_hours', [0] * 24)
+                    
+                logger.info("Dashboard data loaded successfully")
     except Exception as e:
         logger.error(f"Error loading dashboard data: {e}")
 
@@ -586,90 +774,161 @@ def home():
     """Render the home dashboard"""
     try:
         # Just send the initial data without full recalculation
-        return render_template('dashboard.html', data=dashboard_data)
+        # Top songs are kept as a url -> entry map and history as a deque, the template wants sliceable lists
+        with _data_lock:
+            data = dict(
+                dashboard_data,
+                top_songs=sorted_top_songs(dashboard_data['top_songs'], TOP_SONGS_LIMIT),
+                song_history=list(dashboard_data['song_history'])
+            )
+            return render_template('dashboard.html', data=data)
     except Exception as e:
         logger.error(f"Error rendering home template: {e}", exc_info=True)
         return jsonify({"error": "Template rendering error", "details": str(e)}), 500
 
+def client_has_version(version):
+    """Whether the client's If-None-Match already names this data version"""
+    return request.if_none_match.contains_weak(str(version))
+
+def versioned(response, version):
+    """Tag an API response with the data version, so pollers revalidate instead of refetching"""
+    response.set_etag(str(version), weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def not_modified(version):
+    """Bodyless 304 for a client that already has this data version"""
+    return versioned(app.response_class(status=304), version)
+
 @app.route(f'{URL_PREFIX}/api/stats')
 def get_stats():
+    global _stats_response_cache, data_changed, changed_guild_ids, _guild_stats_sends
+    
     # Check if client provided last-updated timestamp
     client_last_updated = request.args.get('last_updated', 0, type=int)
     server_last_updated = dashboard_data['bot_stats'].get('last_updated', 0)
     
     # Only recalculate if client data is older than server data
     if client_last_updated < server_last_updated:
-        update_stats()
-        
-        # Create a response with only changed data
-        response_data = {
-            'last_updated': server_last_updated
-        }
+        refresh_stats()
+        version = dashboard_data['bot_stats']['last_updated']
+        if client_has_version(version):
+            return not_modified(version)
         
-        # Only include data that has changed
-        if data_changed['bot_stats']:
-            response_data['bot_stats'] = dashboard_data['bot_stats']
-            data_changed['bot_stats'] = False
+        # Flags are taken and the body serialized in one go, so no update slips in between
+        with _data_lock:
+            # Serve the already built body unless the data moved on since it was built,
+            # or it's a delta from a version this client doesn't hold
+            cached_version, cached_base, cached_body = _stats_response_cache
+            if cached_version == version and not data_changed and cached_base in (None, client_last_updated):
+                return versioned(app.response_class(cached_body, mimetype='application/json'), version)
             
-        if data_changed['song_history']:
-            response_data['song_history'] = dashboard_data['song_history']
-            data_changed['song_history'] = False
-            
-        if data_changed['guild_stats']:
-            response_data['guild_stats'] = dashboard_data['guild_stats']
-            data_changed['guild_stats'] = False
+            # Create a response with only changed data
+            response_data = {
+                'last_updated': server_last_updated
+            }
             
-        # Reset flags after sending
-        for key in data_changed:
-            data_changed[key] = False
+            # Take the flags and reset them for the next change
+            changed = data_changed
+            data_changed = 0
+            guild_ids = changed_guild_ids
+            changed_guild_ids = set()
             
-        return jsonify(response_data)
+            # The flags cover changes since the last response, so a delta only fits a client that holds its version
+            base = cached_version if changed else None
+            if base is None or client_last_updated != base:
+                base = None
+                response_data['bot_stats'] = dashboard_data['bot_stats']
+                response_data['song_history'] = list(dashboard_data['song_history'])
+                response_data['guild_stats'] = dashboard_data['guild_stats']
+            else:
+                # Only include data that has changed
+                if changed & DIRTY_BOT_STATS:
+                    response_data['bot_stats'] = dashboard_data['bot_stats']
+                    
+                if changed & DIRTY_SONG_HISTORY:
+                    response_data['song_history'] = list(dashboard_data['song_history'])
+                    
+                if changed & DIRTY_GUILD_STATS:
+                    # Only the guilds that changed, with a periodic full snapshot
+                    guild_stats = dashboard_data['guild_stats']
+                    if _guild_stats_sends % GUILD_STATS_FULL_EVERY == 0:
+                        response_data['guild_stats'] = guild_stats
+                    else:
+                        response_data['guild_stats'] = {guild_id: guild_stats[guild_id] for guild_id in guild_ids if guild_id in guild_stats}
+                        response_data['guild_stats_partial'] = True
+                    _guild_stats_sends += 1
+                
+            response = jsonify(response_data)
+            _stats_response_cache = (version, base, response.get_data())
+            return versioned(response, version)
     else:
         # No changes, return minimal response
-        return jsonify({'last_updated': server_last_updated, 'no_changes': True})
+        if client_has_version(server_last_updated):
+            return not_modified(server_last_updated)
+        return versioned(jsonify({'last_updated': server_last_updated, 'no_changes': True}), server_last_updated)
 
 @app.route(f'{URL_PREFIX}/api/guilds')
 def get_guilds():
+    global data_changed
+    
     # Check if client provided last-updated timestamp
     client_last_updated = request.args.get('last_updated', 0, type=int)
     server_last_updated = dashboard_data['bot_stats'].get('last_updated', 0)
     
+    # Nothing to send if the client already holds this version
+    if client_has_version(server_last_updated):
+        return not_modified(server_last_updated)
+    
     # Only update if client data is older
-    if client_last_updated < server_last_updated and data_changed['guild_stats']:
-        update_stats()
-        data_changed['guild_stats'] = False
-        return jsonify(dashboard_data['guild_stats'])
+    if client_last_updated < server_last_updated and data_changed & DIRTY_GUILD_STATS:
+        refresh_stats()
+        with _data_lock:
+            data_changed &= ~DIRTY_GUILD_STATS
+            version = dashboard_data['bot_stats']['last_updated']
+            return versioned(jsonify(dashboard_data['guild_stats']), version)
     else:
         # No changes
-        return jsonify({'no_changes': True})
+        return versioned(jsonify({'no_changes': True}), server_last_updated)
 
 @app.route(f'{URL_PREFIX}/guild/<guild_id>')
 def guild_detail(guild_id):
     # Only update stats if this guild's data has changed
-    guild_data = dashboard_data['guild_stats'].get(guild_id, {})
-    return render_template('guild.html', guild=guild_data, guild_id=guild_id)
+    with _data_lock:
+        guild_data = dashboard_data['guild_stats'].get(guild_id, {})
+        return render_template('guild.html', guild=guild_data, guild_id=guild_id)
 
 @app.route(f'{URL_PREFIX}/api/history')
 def get_history():
+    global data_changed
+    
     # Check if client provided last-updated timestamp
     client_last_updated = request.args.get('last_updated', 0, type=int)
     server_last_updated = dashboard_data['bot_stats'].get('last_updated', 0)
     
+    # Nothing to send if the client already holds this version
+    if client_has_version(server_last_updated):
+        return not_modified(server_last_updated)
+    
     # Only update if client data is older
-    if client_last_updated < server_last_updated and data_changed['song_history']:
-        data_changed['song_history'] = False
-        return jsonify(dashboard_data['song_history'])
+    if client_last_updated < server_last_updated and data_changed & DIRTY_SONG_HISTORY:
+        with _data_lock:
+            data_changed &= ~DIRTY_SONG_HISTORY
+            history = list(dashboard_data['song_history'])
+        return versioned(jsonify(history), server_last_updated)
     else:
         # No changes
-        return jsonify({'no_changes': True})
+        return versioned(jsonify({'no_changes': True}), server_last_updated)
 
-# Auto save data every 5 minutes
+# Auto save changed data at most every 5 minutes
 def auto_save_task():
-    """Periodically save dashboard data to disk"""
-    import time
+    """Save dashboard data to disk a while after it changes, and never when it hasn't"""
     while True:
-        time.sleep(300)  # 5 minutes
-        save_dashboard_data()
+        _unsaved_changes.wait()
+        # Let further changes pile up into the same write
+        time.sleep(AUTO_SAVE_INTERVAL)
+        if _unsaved_changes.is_set():
+            save_dashboard_data()
 
 # Start the dashboard server
 def start_dashboard(host='0.0.0.0', port=8080, url_prefix='/musho', debug=False):
@@ -688,12 +947,18 @@ def start_dashboard(host='0.0.0.0', port=8080, url_prefix='/musho', debug=False)
         # Log the network binding configuration
         logger.info(f"Flask app configured to bind to: {host}:{port}")
         
-        # Simplify by running Flask directly without middleware
+        # Serve with waitress when available, falling back to Flask's dev server
         def run_app():
             try:
                 logger.info(f"Starting dashboard server on 0.0.0.0:{port} with routes at {url_prefix}")
                 # Force app to bind to 0.0.0.0 - this is the key fix for "Connection reset by peer"
-                app.run(host='0.0.0.0', port=port, debug=False, threaded=True)
+                if waitress_serve:
+                    waitress_serve(app, host='0.0.0.0', port=port, threads=DASHBOARD_THREADS,
+                                   connection_limit=DASHBOARD_CONNECTION_LIMIT,
+                                   channel_timeout=DASHBOARD_CHANNEL_TIMEOUT)
+                else:
+                    logger.warning("waitress is not installed, using the Flask development server")
+                    app.run(host='0.0.0.0', port=port, debug=False, threaded=True)
             except Exception as e:
                 logger.error(f"Error starting dashboard server: {e}", exc_info=True)
             
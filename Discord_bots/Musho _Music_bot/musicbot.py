@@ -1,14 +1,18 @@
 import asyncio
+import atexit
+import errno
 import json
 import logging
 import os
 import shutil
-from collections import defaultdict
+import time
+from collections import defaultdict, deque, OrderedDict
 from typing import Optional, Tuple, List, Dict, Union
-import itertools
 import re
 import subprocess
+import tempfile
 import urllib.parse
+from dataclasses import dataclass, field
 
 import discord
 import aiohttp
@@ -45,6 +49,12 @@ MAX_RETRY_ATTEMPTS = 3
 RETRY_DELAY = 1
 DEFAULT_VOLUME = float(os.getenv("DEFAULT_VOLUME", "0.2"))
 MAX_SONG_LENGTH = int(os.getenv("MAX_SONG_LENGTH", "7200"))  # 120 minutes in seconds
+# Max yt-dlp downloads running at once across all guilds - each one is a heavy CPU/network/RAM spike
+DOWNLOAD_CONCURRENCY = int(os.getenv("DOWNLOAD_CONCURRENCY", "3"))
+download_sem = asyncio.Semaphore(DOWNLOAD_CONCURRENCY)
+# Shared worker threads for blocking yt-dlp calls, sized to match the download cap
+YTDLP_EXECUTOR = ThreadPoolExecutor(max_workers=DOWNLOAD_CONCURRENCY, thread_name_prefix="ytdlp")
+atexit.register(YTDLP_EXECUTOR.shutdown, wait=False)
 # Proxy URL (if needed)
 PROXY_URL = os.getenv("PROXY_URL")
 
@@ -53,25 +63,85 @@ SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
 SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
 SPOTIFY_REDIRECT_URI = os.getenv("SPOTIFY_REDIRECT_URI")
 
+# Status messages for the bot to cycle through
+STATUS_MESSAGES = (
+    "HELP ME IM STUCK IN AWS",
+    "Im not a bot, I am a human",
+    "Lebron lying face down so funny bruh",
+    "11.219464, 123.732551"
+)
+
+# Recently downloaded songs are reused by URL while their file is still on disk
+SONG_CACHE_TTL = 1800  # seconds
+SONG_CACHE_SIZE = 512
+# Different forms of the same YouTube link share one cache entry, keyed by video id
+YOUTUBE_VIDEO_ID_PATTERN = re.compile(r'(?:youtube\.com/(?:watch\?(?:.*&)?v=|shorts/|embed/)|youtu\.be/)([\w-]{11})')
+
 # Spotify URL patterns - improved to handle all possible Spotify URL formats
-SPOTIFY_TRACK_URL_PATTERN = r'https?://open\.spotify\.com/track/([a-zA-Z0-9]+)(\?.*)?'
-SPOTIFY_PLAYLIST_URL_PATTERN = r'https?://open\.spotify\.com/playlist/([a-zA-Z0-9]+)(\?.*)?'
-SPOTIFY_ALBUM_URL_PATTERN = r'https?://open\.spotify\.com/album/([a-zA-Z0-9]+)(\?.*)?'
+SPOTIFY_TRACK_URL_PATTERN = re.compile(r'https?://open\.spotify\.com/track/([a-zA-Z0-9]+)(\?.*)?')
+SPOTIFY_PLAYLIST_URL_PATTERN = re.compile(r'https?://open\.spotify\.com/playlist/([a-zA-Z0-9]+)(\?.*)?')
+SPOTIFY_ALBUM_URL_PATTERN = re.compile(r'https?://open\.spotify\.com/album/([a-zA-Z0-9]+)(\?.*)?')
 # Also handle shortened URLs
-SPOTIFY_SHORT_URL_PATTERN = r'https?://spotify\.link/([a-zA-Z0-9]+)'
-
+SPOTIFY_SHORT_URL_PATTERN = re.compile(r'https?://spotify\.link/([a-zA-Z0-9]+)')
+# Type and id out of any open.spotify.com or spotify: URI
+SPOTIFY_URI_PATTERN = re.compile(r"(?:open\.spotify\.com/|spotify:)([a-z]+)(?:/|:)(\w+)")
+
+def replace_file_atomically(path: str, write) -> None:
+    """Build a file next to path with write(tmp_path) and swap it into place,
+    so readers like yt-dlp see either the old file or the new one, never a partial one"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def copy_cookies_atomically() -> None:
+    """Refresh the writable cookies copy without truncating it under a running download"""
+    replace_file_atomically(YOUTUBE_COOKIES_WRITABLE, lambda tmp_path: shutil.copy2(YOUTUBE_COOKIES, tmp_path))
+
+@dataclass(slots=True)
 class Song:
-    def __init__(self, filename: str, title: str, duration: str, url: str, thumbnail: str):
-        self.filename = filename
-        self.title = title
-        self.duration = duration
-        self.url = url
-        self.thumbnail = thumbnail
-        self.playlist_info = None  # Optional playlist metadata
-
-    @property
-    def tuple(self) -> tuple:
-        return (self.filename, self.title, self.duration, self.url, self.thumbnail)
+    filename: str
+    title: str
+    duration: str
+    url: str
+    thumbnail: str
+    playlist_info: Optional[dict] = field(default=None, init=False)  # Optional playlist metadata
+    # Derived once on construction so the dashboard and /queue don't rebuild them on every render
+    duration_seconds: int = field(init=False)
+    artist: str = field(init=False)
+    track_title: str = field(init=False)
+    queue_line: str = field(init=False)
+
+    def __post_init__(self):
+        self.duration_seconds = self._parse_duration(self.duration)
+        self.artist, self.track_title = self._split_title(self.title)
+        self.queue_line = f"[{self.title}]({self.url})"
+
+    @staticmethod
+    def _parse_duration(duration: str) -> int:
+        """Convert an "M:SS" duration to seconds, 0 if it is unknown or malformed"""
+        if not duration:
+            return 0
+        duration_parts = duration.split(':')
+        if len(duration_parts) != 2:
+            return 0
+        try:
+            return int(duration_parts[0]) * 60 + int(duration_parts[1])
+        except ValueError:
+            return 0
+
+    @staticmethod
+    def _split_title(title: str) -> tuple:
+        """Split a title usually in the format "Artist - Title" into (artist, title)"""
+        title_parts = title.split(" - ", 1) if title else []
+        if len(title_parts) > 1:
+            return title_parts[0], title_parts[1]
+        return "Unknown Artist", title
 
 class SpotifyClient:
     def __init__(self):
@@ -123,37 +193,35 @@ class SpotifyClient:
 
     def is_spotify_url(self, url: str) -> bool:
         """Check if the URL is a Spotify URL."""
-        return bool(re.match(SPOTIFY_TRACK_URL_PATTERN, url)) or \
-               bool(re.match(SPOTIFY_PLAYLIST_URL_PATTERN, url)) or \
-               bool(re.match(SPOTIFY_ALBUM_URL_PATTERN, url))
+        return self.get_track_type(url) is not None
 
     def get_track_type(self, url: str) -> Optional[str]:
         """Determine the type of Spotify URL (track, playlist, album)."""
-        if re.match(SPOTIFY_TRACK_URL_PATTERN, url):
+        if SPOTIFY_TRACK_URL_PATTERN.match(url):
             return "track"
-        elif re.match(SPOTIFY_PLAYLIST_URL_PATTERN, url):
+        elif SPOTIFY_PLAYLIST_URL_PATTERN.match(url):
             return "playlist"
-        elif re.match(SPOTIFY_ALBUM_URL_PATTERN, url):
+        elif SPOTIFY_ALBUM_URL_PATTERN.match(url):
             return "album"
         return None
 
     def get_track_id(self, url: str) -> Optional[str]:
         """Extract the track ID from a Spotify track URL."""
-        match = re.match(SPOTIFY_TRACK_URL_PATTERN, url)
+        match = SPOTIFY_TRACK_URL_PATTERN.match(url)
         if match:
             return match.group(1)
         return None
 
     def get_playlist_id(self, url: str) -> Optional[str]:
         """Extract the playlist ID from a Spotify playlist URL."""
-        match = re.match(SPOTIFY_PLAYLIST_URL_PATTERN, url)
+        match = SPOTIFY_PLAYLIST_URL_PATTERN.match(url)
         if match:
             return match.group(1)
         return None
 
     def get_album_id(self, url: str) -> Optional[str]:
         """Extract the album ID from a Spotify album URL."""
-        match = re.match(SPOTIFY_ALBUM_URL_PATTERN, url)
+        match = SPOTIFY_ALBUM_URL_PATTERN.match(url)
         if match:
             return match.group(1)
         return None
@@ -171,7 +239,7 @@ class SpotifyClient:
     def parse_url(self, url: str) -> tuple[str, str]:
         """Parse a Spotify URL to extract the type and ID."""
         try:
-            return re.search(r"(?:open\.spotify\.com/|spotify:)([a-z]+)(?:/|:)(\w+)", url).groups()
+            return SPOTIFY_URI_PATTERN.search(url).groups()
         except AttributeError:
             logger.error(f"Invalid Spotify URL: {url}")
             return None, None
@@ -233,9 +301,8 @@ class SpotifyClient:
             return None
             
         try:
-            # Create a unique download directory for this track with proper permissions
+            # Created once when the bot starts
             download_dir = os.path.join(os.getcwd(), "downloads", "spotify")
-            os.makedirs(download_dir, exist_ok=True)
             
             # Get track metadata using spotipy
             track_id = self.get_track_id(url)
@@ -243,7 +310,7 @@ class SpotifyClient:
                 logger.error(f"Could not extract track ID from Spotify URL: {url}")
                 return None
                 
-            track_info = self.get_track_info(track_id)
+            track_info = await asyncio.to_thread(self.get_track_info, track_id)
             if not track_info:
                 logger.error(f"Could not get track info from Spotify: {url}")
                 return None
@@ -278,7 +345,7 @@ class SpotifyClient:
             if os.path.exists(YOUTUBE_COOKIES):
                 try:
                     # Make a writable copy of the cookies file
-                    shutil.copy2(YOUTUBE_COOKIES, YOUTUBE_COOKIES_WRITABLE)
+                    await asyncio.to_thread(copy_cookies_atomically)
                     cookies_file = YOUTUBE_COOKIES_WRITABLE
                     logger.info(f"Created writable copy of YouTube cookies at: {cookies_file}")
                 except Exception as e:
@@ -316,10 +383,11 @@ class SpotifyClient:
             # Execute the download
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
                 logger.info(f"Downloading Spotify track via YouTube Music: {track_artist} - {track_title}")
-                info = await asyncio.get_event_loop().run_in_executor(
-                    ThreadPoolExecutor(1),
-                    lambda: ydl.extract_info(yt_search_url, download=True)
-                )
+                async with download_sem:
+                    info = await asyncio.get_event_loop().run_in_executor(
+                        YTDLP_EXECUTOR,
+                        lambda: ydl.extract_info(yt_search_url, download=True)
+                    )
                 
                 if not info:
                     logger.error("No info returned from yt-dlp for Spotify track")
@@ -343,33 +411,39 @@ class SpotifyClient:
                 logger.info(f"Successfully downloaded Spotify track to: {filename}")
                 
                 # Create a Song object with the track's metadata
-                return Song(
+                song = Song(
                     filename=filename,
                     title=f"{track_artist} - {track_title}",
                     duration=duration_str,
                     url=url,
                     thumbnail=thumbnail
                 )
+                return song
                 
         except Exception as e:
             logger.error(f"Error downloading track from Spotify: {e}", exc_info=True)
             return None
 
+    async def _fetch_all_pages(self, fetch_page, page_size: int) -> List[Dict]:
+        """Items of every page of a Spotify listing. The first page gives the total,
+        then the remaining pages are fetched concurrently off the event loop."""
+        first_page = await asyncio.to_thread(fetch_page, 0)
+        pages = await asyncio.gather(*(
+            asyncio.to_thread(fetch_page, offset)
+            for offset in range(page_size, first_page['total'], page_size)
+        ))
+        return [item for page in (first_page, *pages) for item in page['items']]
+
     async def get_playlist_tracks(self, playlist_id: str) -> List[Dict]:
         """Get tracks in a playlist."""
         if not self.is_available():
             return []
         try:
-            results = []
-            playlist_tracks = self.client.playlist_tracks(playlist_id)
-            results.extend([item['track'] for item in playlist_tracks['items'] if item['track']])
-
-            # Handle pagination for playlists with more than 100 tracks
-            while playlist_tracks['next']:
-                playlist_tracks = self.client.next(playlist_tracks)
-                results.extend([item['track'] for item in playlist_tracks['items'] if item['track']])
-
-            return results
+            items = await self._fetch_all_pages(
+                lambda offset: self.client.playlist_tracks(playlist_id, limit=100, offset=offset),
+                100
+            )
+            return [item['track'] for item in items if item['track']]
         except Exception as e:
             logger.error(f"Error getting playlist tracks from Spotify: {e}")
             return []
@@ -379,16 +453,10 @@ class SpotifyClient:
         if not self.is_available():
             return []
         try:
-            results = []
-            album_tracks = self.client.album_tracks(album_id)
-            results.extend(album_tracks['items'])
-
-            # Handle pagination for albums with more than 50 tracks
-            while album_tracks['next']:
-                album_tracks = self.client.next(album_tracks)
-                results.extend(album_tracks['items'])
-
-            return results
+            return await self._fetch_all_pages(
+                lambda offset: self.client.album_tracks(album_id, limit=50, offset=offset),
+                50
+            )
         except Exception as e:
             logger.error(f"Error getting album tracks from Spotify: {e}")
             return []
@@ -399,10 +467,6 @@ class SpotifyClient:
             return []
             
         try:
-            # Create a unique download directory for this playlist with proper permissions
-            download_dir = os.path.join(os.getcwd(), "downloads", "spotify", f"playlist_{playlist_id}")
-            os.makedirs(download_dir, exist_ok=True)
-            
             # Get playlist info for better details
             playlist_info = self.client.playlist(playlist_id)
             playlist_name = playlist_info['name']
@@ -459,10 +523,6 @@ class SpotifyClient:
             return []
             
         try:
-            # Create a unique download directory for this album with proper permissions
-            download_dir = os.path.join(os.getcwd(), "downloads", "spotify", f"album_{album_id}")
-            os.makedirs(download_dir, exist_ok=True)
-            
             # Get album info for better details
             album_info = self.client.album(album_id)
             album_name = album_info['name']
@@ -526,32 +586,35 @@ class SpotifyClient:
 
 class QueueManager:
     def __init__(self):
-        self.queues = defaultdict(list)
+        self.queues = defaultdict(deque)  # Songs are taken from the front as they start playing
         self.current_songs = {}
         self.file_use_count = defaultdict(int)
         self._queue_locks = defaultdict(asyncio.Lock)
-        self._download_tasks = {}  # Track download tasks per guild
-        self.download_queue = {}   # Track songs pending download
         self._cleanup_tasks = set()  # Track cleanup tasks
 
-    async def add_song(self, guild_id: int, song: Song) -> None:
+    async def add_song(self, guild_id: int, song: Song, reserved: bool = False) -> None:
+        """Queue a song. reserved means the caller already took its file use with reserve_file"""
         async with self._queue_locks[guild_id]:
-            self.queues[guild_id].append(song)
-            self.file_use_count[song.filename] += 1
-            # Start pre-downloading next songs if needed
-            await self._schedule_downloads(guild_id)
+            queue = self.queues[guild_id]
+            queue.append(song)
+            if not reserved:
+                self.file_use_count[song.filename] += 1
+
+    def reserve_file(self, filename: str) -> None:
+        """Count a use of a file ahead of queueing it, so a pending delayed cleanup leaves it alone.
+        Released by add_song(reserved=True) taking it over, or by cleanup_file"""
+        self.file_use_count[filename] += 1
 
     async def remove_song(self, guild_id: int, index: int) -> Optional[Song]:
         async with self._queue_locks[guild_id]:
-            if not self.queues[guild_id]:
+            queue = self.queues[guild_id]
+            if not queue:
                 return None
-            song = self.queues[guild_id].pop(index)
-            # Cancel any pending download for this song
-            if guild_id in self._download_tasks:
-                self._download_tasks[guild_id] = [
-                    task for task in self._download_tasks[guild_id]
-                    if task.get_name() != song.filename
-                ]
+            if index == 0:
+                song = queue.popleft()
+            else:
+                song = queue[index]
+                del queue[index]
             return song
 
     async def clear_guild_queue(self, guild_id: int) -> None:
@@ -559,39 +622,20 @@ class QueueManager:
             await self._cleanup_guild_resources(guild_id)
             self.queues[guild_id].clear()
             self.current_songs.pop(guild_id, None)
-            # Cancel all pending downloads
-            if guild_id in self._download_tasks:
-                for task in self._download_tasks[guild_id]:
-                    task.cancel()
-                self._download_tasks[guild_id] = []
-
-    async def _schedule_downloads(self, guild_id: int) -> None:
-        """Schedule pre-downloads for upcoming songs"""
-        if guild_id not in self._download_tasks:
-            self._download_tasks[guild_id] = []
-
-        # Clean up completed download tasks
-        self._download_tasks[guild_id] = [
-            task for task in self._download_tasks[guild_id]
-            if not task.done()
-        ]
-
-        # Schedule downloads for the next few songs that haven't been downloaded
-        for song in self.queues[guild_id][:3]:  # Pre-download next 3 songs
-            if not os.path.exists(song.filename):
-                # Check if download is already scheduled
-                if not any(task.get_name() == song.filename for task in self._download_tasks[guild_id]):
-                    task = asyncio.create_task(
-                        self._download_song(song.url),
-                        name=song.filename
-                    )
-                    self._download_tasks[guild_id].append(task)
+        self._gc_guild(guild_id)
+
+    def _gc_guild(self, guild_id: int) -> None:
+        """Drop per-guild state once a guild has nothing queued or playing, so idle guilds don't pile up"""
+        if self.queues.get(guild_id) or guild_id in self.current_songs:
+            return
+        self.queues.pop(guild_id, None)
+        lock = self._queue_locks.get(guild_id)
+        if lock and not lock.locked():
+            del self._queue_locks[guild_id]
 
     async def _cleanup_guild_resources(self, guild_id: int) -> None:
         """Clean up all resources for a guild"""
-        cleanup_tasks = []
-        for song in self.queues[guild_id]:
-            cleanup_tasks.append(self.cleanup_file(song.filename))
+        cleanup_tasks = [self.cleanup_file(song.filename) for song in self.queues[guild_id]]
         
         # Wait for all cleanup tasks to complete
         if cleanup_tasks:
@@ -599,9 +643,10 @@ class QueueManager:
 
     async def cleanup_file(self, filename: str) -> None:
         """Clean up a file when it's no longer needed"""
-        if filename in self.file_use_count:
-            self.file_use_count[filename] -= 1
-            if self.file_use_count[filename] <= 0:
+        file_use_count = self.file_use_count
+        if filename in file_use_count:
+            file_use_count[filename] -= 1
+            if file_use_count[filename] <= 0:
                 cleanup_task = asyncio.create_task(
                     self._delayed_file_cleanup(filename),
                     name=f"cleanup_{filename}"
@@ -614,11 +659,14 @@ class QueueManager:
         try:
             # Wait a short time before cleanup to ensure file is not in use
             await asyncio.sleep(1)
+            # Queued again in the meantime, its songs still need the file
+            if self.file_use_count.get(filename, 0) > 0:
+                return
             retry_count = 0
             while retry_count < 3:
                 try:
-                    if os.path.exists(filename):
-                        os.remove(filename)
+                    if await asyncio.to_thread(os.path.exists, filename):
+                        await asyncio.to_thread(os.remove, filename)
                     del self.file_use_count[filename]
                     break
                 except (PermissionError, OSError) as e:
@@ -644,6 +692,9 @@ class MusicBot(commands.Bot):
         self.queue_manager = QueueManager()
         self.spotify_client = SpotifyClient()
         self.tree.on_error = self.on_tree_error
+        self._recent_songs = OrderedDict()  # cache key -> (Song, downloaded at)
+        self._song_downloads = {}  # cache key -> in-flight download task
+        self._status_idx = 0  # Next entry of STATUS_MESSAGES to show
         
         # Set up download directories with proper permissions
         try:
@@ -653,6 +704,7 @@ class MusicBot(commands.Bot):
             # Create main directories if they don't exist
             os.makedirs(downloads_dir, exist_ok=True)
             os.makedirs(spotify_dir, exist_ok=True)
+            os.makedirs(os.path.dirname(YOUTUBE_COOKIES_WRITABLE), exist_ok=True)
             
             logger.info(f"Download directories set up at {downloads_dir}")
             
@@ -729,7 +781,14 @@ class MusicBot(commands.Bot):
                 self.dashboard_enabled = False
             
         await self.change_presence(activity=discord.Game(name="your dog music fr"))
-        self.presence_loop.start()
+        # on_ready fires again after a reconnect, the loop is already running by then
+        if not self.presence_loop.is_running():
+            self.presence_loop.start()
+
+    async def on_voice_state_update(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
+        # Once the bot has left voice in a guild, nothing it had queued there will play
+        if member.id == self.user.id and before.channel and not after.channel:
+            await self.queue_manager.clear_guild_queue(member.guild.id)
 
     async def setup_commands(self) -> None:
         """Register all music-related commands"""
@@ -772,13 +831,13 @@ class MusicBot(commands.Bot):
                     await processing_message.edit(embed=error_embed)
                     return
 
-                await self.queue_manager.add_song(interaction.guild_id, song)
+                await self.queue_manager.add_song(interaction.guild_id, song, reserved=True)
                 
                 if not voice_client.is_playing():
                     await self._play_next(interaction.guild, interaction)
                 else:
                     # Update the processing message with queue info
-                    position = len(self.queue_manager.queues[interaction.guild_id])
+                    position = len(self.queue_manager.queues.get(interaction.guild_id, ()))
                     success_embed = discord.Embed(
                         title="Track Added",
                         description=f"Added to queue (Position: {position}): {song.title}",
@@ -822,7 +881,7 @@ class MusicBot(commands.Bot):
             if current_song:
                 embed.add_field(
                     name="Now Playing",
-                    value=f"[{current_song.title}]({current_song.url})",
+                    value=current_song.queue_line,
                     inline=False
                 )
             else:
@@ -832,9 +891,8 @@ class MusicBot(commands.Bot):
                     inline=False
                 )
 
-            queue_list = []
-            for idx, song in enumerate(self.queue_manager.queues[interaction.guild_id], 1):
-                queue_list.append(f"{idx}. [{song.title}]({song.url})")
+            queue_list = [f"{idx}. {song.queue_line}"
+                          for idx, song in enumerate(self.queue_manager.queues.get(interaction.guild_id, ()), 1)]
 
             if queue_list:
                 embed.add_field(
@@ -855,7 +913,7 @@ class MusicBot(commands.Bot):
 
         @self.tree.command(name="clear", description="Clear the queue")
         async def clear(interaction: discord.Interaction):
-            if not self.queue_manager.queues[interaction.guild_id]:
+            if not self.queue_manager.queues.get(interaction.guild_id):
                 await interaction.response.send_message("The queue is already empty!")
                 return
 
@@ -908,8 +966,7 @@ class MusicBot(commands.Bot):
                     return
                 
                 # Write the new cookies to file
-                with open(YOUTUBE_COOKIES, 'w', encoding='utf-8') as f:
-                    f.write(cookie_data)
+                await asyncio.to_thread(self._write_cookies, cookie_data)
                 
                 logger.info(f"YouTube cookies updated by admin {interaction.user.name} in guild {interaction.guild.name}")
                 await interaction.followup.send("✅ YouTube cookies updated successfully!", ephemeral=True)
@@ -922,6 +979,20 @@ class MusicBot(commands.Bot):
                     ephemeral=True
                 )
 
+    @staticmethod
+    def _write_cookies(cookie_data: str) -> None:
+        def write(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(cookie_data)
+        try:
+            replace_file_atomically(YOUTUBE_COOKIES, write)
+        except OSError as e:
+            # docker-compose bind-mounts the cookies file on its own, and a mount point can't be renamed over.
+            # Its only reader is copy_cookies_atomically, so an in-place write is safe enough there
+            if e.errno not in (errno.EBUSY, errno.EXDEV):
+                raise
+            write(YOUTUBE_COOKIES)
+
     async def _ensure_voice_client(self, interaction: discord.Interaction) -> Optional[discord.VoiceClient]:
         if not interaction.user.voice:
             await interaction.followup.send("You must be in a voice channel to use this command!")
@@ -944,37 +1015,48 @@ class MusicBot(commands.Bot):
 
     async def _play_next(self, guild: discord.Guild, interaction: discord.Interaction) -> None:
         try:
-            if not guild.id in self.queue_manager.queues or not self.queue_manager.queues[guild.id]:
-                if guild.voice_client:
-                    await self._play_leave_sound(guild.voice_client)
-                return
+            # Skip over songs that can't be played until one starts or the queue runs out
+            while True:
+                queue = self.queue_manager.queues.get(guild.id)
+                if not queue:
+                    if guild.voice_client:
+                        await self._play_leave_sound(guild.voice_client)
+                    return
 
-            song = self.queue_manager.queues[guild.id][0]
-            
-            # Verify the song file exists before playing
-            if not os.path.exists(song.filename):
-                logger.error(f"Song file missing: {song.filename}")
-                await interaction.channel.send(f"⚠️ Error: Could not play {song.title} (file missing)")
-                # Try to play next song
-                await self._play_next(guild, interaction)
-                return
+                song = queue[0]
+                
+                # Songs are downloaded before they are queued, but the file may have been removed since
+                if not await asyncio.to_thread(os.path.exists, song.filename):
+                    logger.error(f"Song file missing: {song.filename}")
+                    await interaction.channel.send(f"⚠️ Error: Could not play {song.title} (file missing)")
+                    # Drop it and try the next song
+                    await self.queue_manager.remove_song(guild.id, 0)
+                    await self.queue_manager.cleanup_file(song.filename)
+                    continue
 
-            self.queue_manager.current_songs[guild.id] = song
-            await self.queue_manager.remove_song(guild.id, 0)
+                self.queue_manager.current_songs[guild.id] = song
+                await self.queue_manager.remove_song(guild.id, 0)
 
-            try:
-                audio_source = discord.PCMVolumeTransformer(
-                    discord.FFmpegPCMAudio(song.filename),
-                    volume=DEFAULT_VOLUME
-                )
-                
-                guild.voice_client.play(
-                    audio_source,
-                    after=lambda e: asyncio.run_coroutine_threadsafe(
-                        self._after_play(e, interaction, song),
-                        self.loop
+                try:
+                    audio_source = discord.PCMVolumeTransformer(
+                        discord.FFmpegPCMAudio(song.filename),
+                        volume=DEFAULT_VOLUME
                     )
-                )
+                    
+                    guild.voice_client.play(
+                        audio_source,
+                        after=lambda e: asyncio.run_coroutine_threadsafe(
+                            self._after_play(e, interaction, song),
+                            self.loop
+                        )
+                    )
+                except Exception as e:
+                    logger.error(f"Error starting playback: {e}")
+                    await interaction.channel.send(f"⚠️ Error playing {song.title}")
+                    # Clean up the failed song and try next
+                    self.queue_manager.current_songs.pop(guild.id, None)
+                    await self.queue_manager.cleanup_file(song.filename)
+                    continue
                 
                 # Record song play in dashboard
                 if self.dashboard_enabled:
@@ -984,13 +1066,7 @@ class MusicBot(commands.Bot):
                         logger.error(f"Failed to record song in dashboard: {e}")
                 
                 await self._send_now_playing_embed(interaction, song)
-
-            except Exception as e:
-                logger.error(f"Error starting playback: {e}")
-                await interaction.channel.send(f"⚠️ Error playing {song.title}")
-                # Clean up the failed song and try next
-                await self.queue_manager.cleanup_file(song.filename)
-                await self._play_next(guild, interaction)
+                return
 
         except Exception as e:
             logger.error(f"Error in play_next: {e}")
@@ -1037,12 +1113,14 @@ class MusicBot(commands.Bot):
             self.queue_manager.current_songs.pop(interaction.guild_id, None)
 
             # Start next song or prepare to leave
-            if self.queue_manager.queues[interaction.guild_id]:
+            if self.queue_manager.queues.get(interaction.guild_id):
                 logger.info(f"Playing next song in queue for guild: {guild_name}")
                 await self._play_next(interaction.guild, interaction)
-            elif interaction.guild.voice_client:
-                logger.info(f"Queue empty, preparing to leave guild: {guild_name}")
-                await self._play_leave_sound(interaction.guild.voice_client)
+            else:
+                self.queue_manager._gc_guild(interaction.guild_id)
+                if interaction.guild.voice_client:
+                    logger.info(f"Queue empty, preparing to leave guild: {guild_name}")
+                    await self._play_leave_sound(interaction.guild.voice_client)
 
         except Exception as e:
             logger.error(f"Error after playback for guild {interaction.guild.name}: {str(e)}", exc_info=True)
@@ -1052,7 +1130,7 @@ class MusicBot(commands.Bot):
         """Send a message with the currently playing song details."""
         embed = discord.Embed(
             title="Now Playing",
-            description=f"[{song.title}]({song.url})",
+            description=song.queue_line,
             color=discord.Color.green()
         )
         
@@ -1127,7 +1205,7 @@ class MusicBot(commands.Bot):
         if voice_client and not voice_client.is_playing():
             await self._play_next(interaction.guild, interaction)
         else:
-            position = len(self.queue_manager.queues[interaction.guild_id])
+            position = len(self.queue_manager.queues.get(interaction.guild_id, ()))
             success_embed = discord.Embed(
                 title="Track Added",
                 description=f"Added to queue (Position: {position}): {song.title}",
@@ -1156,7 +1234,9 @@ class MusicBot(commands.Bot):
 
         # Get basic playlist info for the name
         try:
-            playlist_info = self.spotify_client.client.playlist(playlist_id, fields="name,tracks(total)")
+            playlist_info = await asyncio.to_thread(
+                self.spotify_client.client.playlist, playlist_id, fields="name,tracks(total)"
+            )
             playlist_name = playlist_info.get('name', 'Unknown Playlist')
             playlist_total = playlist_info.get('tracks', {}).get('total', 0)
         except Exception as e:
@@ -1299,7 +1379,7 @@ class MusicBot(commands.Bot):
 
         # Get basic album info for the name
         try:
-            album_info = self.spotify_client.client.album(album_id)
+            album_info = await asyncio.to_thread(self.spotify_client.client.album, album_id)
             album_name = album_info.get('name', 'Unknown Album')
             album_artist = album_info.get('artists', [{}])[0].get('name', 'Unknown Artist')
             album_display = f"{album_artist} - {album_name}"
@@ -1436,18 +1516,59 @@ class MusicBot(commands.Bot):
                 
         return added_count > 0
 
+    @staticmethod
+    def _song_cache_key(url: str) -> str:
+        """Cache key for a song URL - the video id for YouTube links, the URL itself otherwise"""
+        match = YOUTUBE_VIDEO_ID_PATTERN.search(url)
+        return match.group(1) if match else url
+
     async def _download_song(self, url: str) -> Optional[Song]:
+        """Get a song for a URL, reusing a recent download of it or one already in progress.
+        The returned song's file is already reserved, queue it with add_song(reserved=True)."""
+        key = self._song_cache_key(url)
+        
+        # Reuse a recent download while its file is still around
+        cached = self._recent_songs.get(key)
+        if cached:
+            song, downloaded_at = cached
+            if time.monotonic() - downloaded_at < SONG_CACHE_TTL:
+                # Reserved before checking, so a cleanup already pending for the file can't delete it from under us
+                self.queue_manager.reserve_file(song.filename)
+                if await asyncio.to_thread(os.path.exists, song.filename):
+                    logger.info(f"Reusing downloaded file for: {url}")
+                    return Song(song.filename, song.title, song.duration, url, song.thumbnail)
+                await self.queue_manager.cleanup_file(song.filename)
+            self._recent_songs.pop(key, None)
+        
+        # Join a download of the same song that's already running instead of starting another
+        task = self._song_downloads.get(key)
+        if task is None:
+            task = asyncio.create_task(self._download_song_uncached(url))
+            self._song_downloads[key] = task
+            task.add_done_callback(lambda _: self._song_downloads.pop(key, None))
+        song = await asyncio.shield(task)
+        if not song:
+            return None
+        
+        self._recent_songs[key] = (song, time.monotonic())
+        self._recent_songs.move_to_end(key)
+        while len(self._recent_songs) > SONG_CACHE_SIZE:
+            self._recent_songs.popitem(last=False)
+        
+        # A cleanup from an earlier play of the same file may still be pending
+        self.queue_manager.reserve_file(song.filename)
+        # Each queue entry gets its own Song
+        return Song(song.filename, song.title, song.duration, url, song.thumbnail)
+
+    async def _download_song_uncached(self, url: str) -> Optional[Song]:
         """Download a song from YouTube using yt-dlp."""
         try:
-            # Create downloads directory if it doesn't exist
-            os.makedirs(os.path.dirname(YOUTUBE_COOKIES_WRITABLE), exist_ok=True)
-            
             # Determine which cookies file to use
             cookies_file = None
             if os.path.exists(YOUTUBE_COOKIES):
                 try:
                     # Make a writable copy of the cookies file
-                    shutil.copy2(YOUTUBE_COOKIES, YOUTUBE_COOKIES_WRITABLE)
+                    await asyncio.to_thread(copy_cookies_atomically)
                     cookies_file = YOUTUBE_COOKIES_WRITABLE
                     logger.info(f"Created writable copy of YouTube cookies at: {cookies_file}")
                 except Exception as e:
@@ -1488,10 +1609,11 @@ class MusicBot(commands.Bot):
                 
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
                 logger.info(f"Downloading audio from: {url}")
-                info = await asyncio.get_event_loop().run_in_executor(
-                    ThreadPoolExecutor(1),
-                    lambda: ydl.extract_info(url, download=True)
-                )
+                async with download_sem:
+                    info = await asyncio.get_event_loop().run_in_executor(
+                        YTDLP_EXECUTOR,
+                        lambda: ydl.extract_info(url, download=True)
+                    )
                 
                 if not info:
                     logger.error("No info returned from yt-dlp")
@@ -1510,13 +1632,14 @@ class MusicBot(commands.Bot):
                 else:
                     duration_str = "Unknown"
 
-                return Song(
+                song = Song(
                     title=info.get('title', 'Unknown Title'),
                     url=url,
                     filename=filename,
                     thumbnail=info.get('thumbnail'),
                     duration=duration_str
                 )
+                return song
 
         except Exception as e:
             logger.error(f"Error downloading song with yt-dlp: {str(e)}")
@@ -1524,15 +1647,10 @@ class MusicBot(commands.Bot):
 
     @tasks.loop(seconds=30)
     async def presence_loop(self):
-        statuses = [
-            "HELP ME IM STUCK IN AWS",
-            "Im not a bot, I am a human",
-            "Lebron lying face down so funny bruh",
-            "11.219464, 123.732551"
-        ]
-        for status in itertools.cycle(statuses):
-            await self.change_presence(activity=discord.CustomActivity(name=status))
-            await asyncio.sleep(30)  # Sleep for 30 seconds before changing to the next status
+        # One status per tick, the loop itself provides the 30 second spacing
+        status = STATUS_MESSAGES[self._status_idx % len(STATUS_MESSAGES)]
+        self._status_idx += 1
+        await self.change_presence(activity=discord.CustomActivity(name=status))
 
     @presence_loop.before_loop
     async def before_presence_loop(self):
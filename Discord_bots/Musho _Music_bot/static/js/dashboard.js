@@ -149,7 +149,7 @@ function updateDashboard(data) {
     
     // Update guild cards including now playing status
     if (data.guild_stats) {
-        updateGuildCards(data.guild_stats);
+        updateGuildCards(data.guild_stats, data.guild_stats_partial);
     }
     
     // Debug info to console to track updates
@@ -371,7 +371,7 @@ function updateTopSongs(songs) {
 }
 
 // Update guild cards if needed
-function updateGuildCards(guildStats) {
+function updateGuildCards(guildStats, partial = false) {
     if (!guildStats) return;
     
     const guildList = document.querySelector('.guild-list');
@@ -612,6 +612,9 @@ function updateGuildCards(guildStats) {
         }
     });
     
+    // A partial update only carries the guilds that changed, the rest are still current
+    if (partial) return;
+    
     // Remove guild cards for servers that are no longer connected
     const existingCards = guildList.querySelectorAll('.guild-card');
     existingCards.forEach(card => {